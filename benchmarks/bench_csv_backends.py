@@ -0,0 +1,35 @@
+"""
+Compare pandas and pyarrow csv parser backends of load_data_table.
+
+Usage (from parent directory of bundles/):
+python -m benchmarks.bench_csv_backends [path to CME_price_data.zip]
+"""
+
+import sys
+import time
+import pandas as pd
+from bundles.fut_bundle import QUANDL_ZIP_FILE, CHUNKSIZE, load_data_table
+
+
+def run(file, backend, chunksize):
+    """Return data table loaded with given backend and time taken.
+    """
+    start = time.perf_counter()
+    df = load_data_table(file, chunksize=chunksize, backend=backend)
+    return df, time.perf_counter() - start
+
+
+def main(file=QUANDL_ZIP_FILE):
+    for chunksize in [CHUNKSIZE, None]:
+        expected, before = run(file, 'pandas', chunksize)
+        result, after = run(file, 'pyarrow', chunksize)
+        pd.testing.assert_frame_equal(expected, result, check_dtype=False)
+
+        print('chunksize {}, {} rows'.format(chunksize, len(result)))
+        print('pandas:  {:.2f}s'.format(before))
+        print('pyarrow: {:.2f}s'.format(after))
+        print('speedup: {:.1f}x'.format(before / after))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,109 @@
+"""
+Run futures_bundle end to end on synthetic data (see benchmarks/synthetic.py)
+without Quandl key or network access and report its throughput and peak memory.
+
+Input files are generated in a temporary directory and the bundle is ingested
+into a temporary zipline root, files in bundles/ and ~/.zipline are not touched.
+Generation runs in a child process, so that peak memory of this process
+is that of ingestion (peak of child processes includes the generator).
+
+Usage (from parent directory of bundles/):
+python -m benchmarks.bench_ingest [roots] [contracts per root] [years]
+"""
+
+import os
+import sys
+import json
+import time
+from multiprocessing import Process
+from contextlib import contextmanager
+from tempfile import TemporaryDirectory
+import pandas as pd
+from zipline.data.bundles import core as bundles
+from bundles import fut_bundle
+from bundles.expiration_downloader import ExpirationDownloader
+from bundles.instrumentation import peak_rss, IngestReport, MB
+from benchmarks.synthetic import generate
+
+
+@contextmanager
+def synthetic_inputs(directory):
+    """Point the bundle to input files in directory and disable downloads,
+    incremental ingestion, contract filter and caches for the duration of the block.
+    """
+    patches = [
+        (fut_bundle, 'QUANDL_ZIP_FILE', os.path.join(directory, 'CME_price_data.zip')),
+        (fut_bundle, 'QUANDL_SPECS_FILE', os.path.join(directory, 'CME_metadata.csv')),
+        (fut_bundle, 'META_FILE', os.path.join(directory, 'meta.csv')),
+        (fut_bundle, 'RAW_DATA_CACHE_DIR', os.path.join(directory, 'cache')),
+        (fut_bundle, 'DOWNLOAD', False),
+        (fut_bundle, 'INCREMENTAL', False),
+        (fut_bundle, 'CACHE_RAW_DATA', False),
+        (fut_bundle, 'INGEST_REPORT', True),
+        (fut_bundle, 'contracts', []),
+        (ExpirationDownloader, 'FILENAME',
+         os.path.join(directory, 'expiration_dates.csv')),
+    ]
+    saved = [(obj, name, getattr(obj, name)) for obj, name, _ in patches]
+    for obj, name, value in patches:
+        setattr(obj, name, value)
+    try:
+        yield
+    finally:
+        for obj, name, value in saved:
+            setattr(obj, name, value)
+
+
+def ingest(zipline_root, start, end, show_progress=False):
+    """Ingest futures bundle into zipline_root, return wall time
+    and ingestion report.
+    """
+    environ = {'ZIPLINE_ROOT': zipline_root, 'QUANDL_API_KEY': 'synthetic'}
+    bundles.unregister('futures')
+    bundles.register('futures', fut_bundle.futures_bundle, calendar_name='NYSE',
+                     start_session=start, end_session=end)
+    begin = time.perf_counter()
+    bundles.ingest('futures', environ, show_progress=show_progress)
+    wall = time.perf_counter() - begin
+    timestr = bundles.to_bundle_ingest_dirname(
+        bundles.ingestions_for_bundle('futures', environ)[0])
+    report_file = os.path.join(zipline_root, 'data', 'futures', timestr,
+                               fut_bundle.INGEST_REPORT_FILE)
+    with open(report_file) as f:
+        return wall, json.load(f)
+
+
+def main(roots=20, contracts_per_root=4, years=10):
+    end = pd.Timestamp('2018-12-31', tz='utc')
+    start = end - pd.DateOffset(years=years)
+    with TemporaryDirectory() as tmp_dir:
+        data_dir = os.path.join(tmp_dir, 'data')
+        begin = time.perf_counter()
+        generator = Process(target=generate,
+                            args=(data_dir, roots, contracts_per_root, years,
+                                  end.tz_localize(None)))
+        generator.start()
+        generator.join()
+        if generator.exitcode:
+            raise RuntimeError('Failed to generate synthetic data')
+        print('synthetic data generated in {:.1f}s'.format(time.perf_counter() - begin))
+
+        with synthetic_inputs(data_dir):
+            wall, report = ingest(os.path.join(tmp_dir, 'zipline'), start, end)
+
+    print()
+    for entry in sorted(report['stages'], key=lambda e: (e['start'], e['depth'])):
+        print(IngestReport.format_stage(entry))
+    stages = {entry['name']: entry for entry in report['stages']}
+    print()
+    print('ingestion:       {:.2f}s'.format(wall))
+    print('rows/sec:        {:,.0f}'.format(stages['quandl data']['rows'] / wall))
+    print('bar rows/sec:    {:,.0f}'.format(
+        stages['daily bars']['rows'] / stages['daily bars']['wall']))
+    process_peak = peak_rss()
+    if process_peak is not None:
+        print('peak rss:        {:.0f}MB'.format(process_peak / MB))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
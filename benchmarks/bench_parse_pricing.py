@@ -0,0 +1,73 @@
+"""
+Compare per-asset bar generation in parse_pricing_and_vol against
+the previous implementation based on MultiIndex cross-sections.
+
+Usage (from parent directory of bundles/):
+python -m benchmarks.bench_parse_pricing [path to CME_price_data.zip]
+"""
+
+import sys
+import time
+import pandas as pd
+from six import iteritems
+from zipline.utils.calendars import get_calendar
+from bundles.fut_bundle import QUANDL_ZIP_FILE, load_data_table, parse_pricing_and_vol
+
+
+def xs_parse_pricing_and_vol(data,
+                             sessions,
+                             symbol_map):
+    """Previous implementation: one cross-section and reindex per asset.
+    """
+    data = data.set_index(['date', 'symbol'])
+    for asset_id, symbol in iteritems(symbol_map):
+        asset_data = data.xs(
+            symbol,
+            level=1
+        ).reindex(
+            sessions.tz_localize(None)
+        ).fillna(0.0)
+        yield asset_id, asset_data
+
+
+def run(generator, raw_data, sessions, symbol_map):
+    """Exhaust generator, return time taken.
+    """
+    start = time.perf_counter()
+    for sid, frame in generator(raw_data, sessions, symbol_map):
+        pass
+    return time.perf_counter() - start
+
+
+def check(raw_data, sessions, symbol_map):
+    """Verify that both implementations produce the same bars.
+    """
+    expected = xs_parse_pricing_and_vol(raw_data, sessions, symbol_map)
+    result = parse_pricing_and_vol(raw_data, sessions, symbol_map)
+    for (sid, frame), (new_sid, new_frame) in zip(expected, result):
+        assert sid == new_sid
+        pd.testing.assert_frame_equal(frame, new_frame[frame.columns],
+                                      check_names=False)
+
+
+def main(file=QUANDL_ZIP_FILE):
+    raw_data = load_data_table(file)
+    calendar = get_calendar('NYSE')
+    sessions = calendar.sessions_in_range(calendar.first_session,
+                                          calendar.last_session)
+    symbol_map = pd.Series(raw_data['symbol'].unique())
+    print('{} rows, {} contracts, {} sessions'.format(
+        len(raw_data), len(symbol_map), len(sessions)))
+
+    check(raw_data, sessions, symbol_map.sample(min(100, len(symbol_map))))
+
+    before = run(xs_parse_pricing_and_vol, raw_data, sessions, symbol_map)
+    after = run(parse_pricing_and_vol, raw_data, sessions, symbol_map)
+
+    print('xs/reindex per asset: {:.2f}s'.format(before))
+    print('sorted block slices:  {:.2f}s'.format(after))
+    print('speedup:              {:.1f}x'.format(before / after))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
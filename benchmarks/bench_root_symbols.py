@@ -0,0 +1,69 @@
+"""
+Compare root_symbols table generation in gen_root_symbols against
+the previous implementation based on a lookup per root and column.
+Asset metadata is generated for every root in meta.csv.
+
+Usage (from parent directory of bundles/):
+python -m benchmarks.bench_root_symbols [contracts per root]
+"""
+
+import sys
+import time
+import pandas as pd
+from bundles.fut_bundle import get_meta_df, gen_root_symbols
+
+
+def lookup_root_symbols(asset_metadata):
+    """Previous implementation: one boolean mask over all contracts per root and column.
+    """
+    root_symbols = asset_metadata.root_symbol.unique()
+    root_symbols = pd.DataFrame(root_symbols, columns=['root_symbol'])
+    root_symbols['root_symbol_id'] = root_symbols.index.values
+
+    root_symbols['sector'] = [asset_metadata.loc[asset_metadata['root_symbol']
+                                                 == rs]['sector'].iloc[0] for rs in root_symbols.root_symbol.unique()]
+    root_symbols['sub_sector'] = [asset_metadata.loc[asset_metadata['root_symbol']
+                                                     == rs]['sub_sector'].iloc[0] for rs in root_symbols.root_symbol.unique()]
+    root_symbols['sector'] = root_symbols['sector'].str.cat(
+        root_symbols['sub_sector'], sep='/')
+
+    root_symbols['exchange'] = [asset_metadata.loc[asset_metadata['root_symbol']
+                                                   == rs]['exchange'].iloc[0] for rs in root_symbols.root_symbol.unique()]
+    root_symbols['description'] = [asset_metadata.loc[asset_metadata['root_symbol']
+                                                      == rs]['name'].iloc[0] for rs in root_symbols.root_symbol.unique()]
+    return root_symbols
+
+
+def asset_metadata_for_all_roots(contracts_per_root):
+    """Metadata of contracts_per_root contracts for every root in meta.csv,
+    sorted by expiry like gen_asset_metadata output, so that roots are interleaved.
+    """
+    meta = get_meta_df()
+    data = pd.concat([meta] * contracts_per_root, keys=range(contracts_per_root))
+    data = data.reset_index(level=0).rename(columns={'level_0': 'month'})
+    data['symbol'] = data['root_symbol'] + data['month'].astype(str)
+    return data.sort_values(by=['month', 'root_symbol']).reset_index(drop=True)
+
+
+def timed(f, *args):
+    start = time.perf_counter()
+    result = f(*args)
+    return time.perf_counter() - start, result
+
+
+def main(contracts_per_root=100):
+    asset_metadata = asset_metadata_for_all_roots(int(contracts_per_root))
+    print('{} roots, {} contracts'.format(
+        asset_metadata['root_symbol'].nunique(), len(asset_metadata)))
+
+    before, expected = timed(lookup_root_symbols, asset_metadata)
+    after, result = timed(gen_root_symbols, asset_metadata)
+    pd.testing.assert_frame_equal(expected[result.columns], result)
+
+    print('lookup per root: {:.3f}s'.format(before))
+    print('first row per root: {:.3f}s'.format(after))
+    print('speedup: {:.0f}x'.format(before / after))
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,235 @@
+"""
+Generate synthetic input files of the futures bundle in the formats of files
+downloaded from Quandl and CME:
+
+CME_price_data.zip: Quandl CME price table (single headerless csv file)
+CME_metadata.csv: Quandl specs table with long style contract codes
+meta.csv: contract specifications by root symbol
+expiration_dates.csv: expiration dates by short style symbol
+
+Price table includes quirks of the Quandl file: option rows with
+two trailing extra columns, INDEX rows, known bad SH1920 rows, rows with
+missing values, weekday rows for exchange holidays and malformed rows.
+
+Usage (from parent directory of bundles/):
+python -m benchmarks.synthetic [directory] [roots] [contracts per root] [years]
+"""
+
+import os
+import sys
+import string
+from io import StringIO
+from itertools import product
+from zipfile import ZipFile, ZIP_DEFLATED
+import numpy as np
+import pandas as pd
+
+
+MONTH_CODES = 'FGHJKMNQUVXZ'
+
+MONTH_NAMES = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+               'August', 'September', 'October', 'November', 'December']
+
+SECTORS = [('Energy', 'Crude Oil'), ('Equities', 'Index'), ('Interest Rates', 'STIR'),
+           ('FX', 'G10'), ('Agriculture', 'Grain'), ('Metals', 'Precious')]
+
+# number of sessions before expiry during which contracts trade
+CONTRACT_LIFE = 260
+
+
+def root_symbols(count):
+    """Quandl style root symbols: one single character root (preceded with
+    underscore by the bundle), every fifth root of three characters,
+    the rest of two characters.
+    """
+    pairs = (''.join(p) for p in product(string.ascii_uppercase, repeat=2)
+             if p[0] != 'C')
+    roots = []
+    for i in range(count):
+        if i == 0:
+            roots.append('C')
+        elif i % 5 == 4:
+            roots.append(next(pairs) + 'X')
+        else:
+            roots.append(next(pairs))
+    return roots
+
+
+def contract_table(roots, contracts_per_root, years, end):
+    """DataFrame of contracts listed for each root: contracts_per_root expiry
+    months per year, for years up to end and one year after it.
+    Columns: root, month, year, expiry, code (long style), symbol (short style).
+    """
+    months = np.linspace(0, 12, contracts_per_root, endpoint=False).astype(int)
+    last_year = end.year + 1
+    rows = [(root, month, year)
+            for root in roots
+            for year in range(last_year - years, last_year + 1)
+            for month in months]
+    df = pd.DataFrame(rows, columns=['root', 'month', 'year'])
+    # expire on the 15th or the following business day
+    df['expiry'] = pd.to_datetime(dict(year=df['year'], month=df['month'] + 1, day=15))
+    df['expiry'] = df['expiry'] + pd.offsets.BDay(0)
+    code = df['root'] + df['month'].map(lambda m: MONTH_CODES[m])
+    df['code'] = code + df['year'].astype(str)
+    df['symbol'] = code + (df['year'] % 100).map('{:02d}'.format)
+    return df
+
+
+def price_table(contracts, sessions, rng):
+    """Quandl price rows (without quirks) for contracts trading during sessions.
+    """
+    frames = []
+    base = dict(zip(contracts['root'].unique(),
+                    rng.uniform(1, 5000, contracts['root'].nunique())))
+    for contract in contracts.itertuples():
+        stop = sessions.searchsorted(contract.expiry, side='right')
+        start = max(stop - CONTRACT_LIFE, 0)
+        dates = sessions[start:stop]
+        n = len(dates)
+        if n == 0:
+            continue
+        close = base[contract.root] * np.exp(np.cumsum(rng.normal(0, .01, n)))
+        close = np.round(close, 2)
+        spread = np.round(close * rng.uniform(0, .01, n), 2)
+        open_ = np.round(close + rng.normal(0, .5, n) * spread, 2)
+        high = np.round(np.maximum(open_, close) + spread, 2)
+        low = np.round(np.maximum(np.minimum(open_, close) - spread, .01), 2)
+        # liquidity rises towards expiry and falls off in the last weeks
+        volume = np.round(rng.gamma(2, 1000, n) * np.linspace(.05, 1, n)).astype(int)
+        volume[-10:] //= 10
+        frames.append(pd.DataFrame({
+            'symbol': contract.code,
+            'date': dates,
+            'open': open_,
+            'high': high,
+            'low': low,
+            'end': close,
+            'change': np.r_[np.nan, np.round(np.diff(close), 2)],
+            'close': close,
+            'volume': volume,
+            'open_interest': np.cumsum(volume) // 3,
+        }))
+    df = pd.concat(frames, ignore_index=True)
+    # missing values as in Quandl file
+    df.loc[rng.random(len(df)) < .01, 'open'] = np.nan
+    df.loc[rng.random(len(df)) < .001, ['high', 'low']] = np.nan
+    return df
+
+
+def quirk_lines(contracts, sessions, rng):
+    """Lines of the Quandl file that the bundle has to skip."""
+    lines = []
+    for contract in contracts.sample(min(20, len(contracts)), random_state=0).itertuples():
+        date = sessions[rng.integers(len(sessions))].strftime('%Y-%m-%d')
+        # option codes with two extra columns
+        lines.append('{}C{},{},1.5,1.6,1.4,1.5,0.1,1.5,10,100,1.0,{}'.format(
+            contract.code, int(rng.integers(10, 500)), date, contract.expiry.date()))
+        # indexes
+        lines.append('{}INDEX,{},100.0,101.0,99.0,100.5,0.5,100.5,0,0'.format(
+            contract.root[:2], date))
+    date = sessions[0].strftime('%Y-%m-%d')
+    # known bad data
+    lines.append('SH1920,{},1.0,1.0,1.0,1.0,,1.0,1,1'.format(date))
+    # malformed row with too many columns
+    lines.append('ZZZ2018,{},1,1,1,1,1,1,1,1,1,1,1'.format(date))
+    return lines
+
+
+def write_price_zip(file, prices, quirks, parts=10):
+    """Write prices as a headerless csv in a zip file with quirk lines
+    interspersed between parts of the table.
+    """
+    buffer = StringIO()
+    chunks = np.array_split(np.arange(len(prices)), parts)
+    for i, chunk in enumerate(chunks):
+        prices.iloc[chunk].to_csv(buffer, header=False, index=False,
+                                  date_format='%Y-%m-%d')
+        for line in quirks[i::parts]:
+            buffer.write(line + '\n')
+    with ZipFile(file, 'w', ZIP_DEFLATED) as zip_file:
+        zip_file.writestr('CME_20181231.csv', buffer.getvalue())
+
+
+def specs_table(contracts, prices, roots):
+    """Quandl specs table: dates are first and last date of data of every contract."""
+    dates = prices.groupby('symbol')['date'].agg(['min', 'max'])
+    contracts = contracts[contracts['code'].isin(dates.index)]
+    names = {root: 'Synthetic {} Futures'.format(root) for root in roots}
+    name = (contracts['root'].map(names) + ', '
+            + contracts['month'].map(lambda m: MONTH_NAMES[m]) + ' '
+            + contracts['year'].astype(str) + ', ' + contracts['code'])
+    url = ('https://www.cmegroup.com/trading/synthetic/'
+           + contracts['root'].str.lower() + '_contract_specifications.html')
+    specs = pd.DataFrame({
+        'code': contracts['code'],
+        'name': name,
+        'description': ('Historical futures prices. <a href=' + url + '>'
+                        + url + '</a>'),
+        'refreshed_at': '2018-12-31 23:00:00 UTC',
+        'from_date': contracts['code'].map(dates['min']).dt.strftime('%Y-%m-%d'),
+        'to_date': contracts['code'].map(dates['max']).dt.strftime('%Y-%m-%d'),
+    })
+    quirks = pd.DataFrame({
+        'code': ['AAINDEX', 'SH1920'],
+        'name': ['Synthetic Index', 'Bad contract'],
+        'description': ['Dataset description', 'Dataset description'],
+        'refreshed_at': '2018-12-31 23:00:00 UTC',
+        'from_date': '2018-01-02',
+        'to_date': '2018-12-31',
+    })
+    return pd.concat([specs, quirks], ignore_index=True)
+
+
+def meta_table(roots):
+    """Contract specifications by root symbol (format of bundles/meta.csv)."""
+    sectors = [SECTORS[i % len(SECTORS)] for i in range(len(roots))]
+    return pd.DataFrame({
+        'root_symbol': roots,
+        'exchange': 'CME',
+        'name': ['Synthetic {} Futures'.format(root) for root in roots],
+        'multiplier': [(10, 50, 100, 1000)[i % 4] for i in range(len(roots))],
+        'tick_size': [(.01, .25, .005, .1)[i % 4] for i in range(len(roots))],
+        'sector': [s for s, _ in sectors],
+        'sub_sector': [s for _, s in sectors],
+    })
+
+
+def expiration_table(contracts, end):
+    """Expiration dates of contracts still trading at end, like dates
+    downloaded from CME for active contracts only.
+    """
+    active = contracts[contracts['expiry'] >= end]
+    return pd.DataFrame({'expiration_date': active['expiry'].values},
+                        index=pd.Index(active['symbol'].values, name='symbol'))
+
+
+def generate(directory, roots=20, contracts_per_root=4, years=10,
+             end='2018-12-31', seed=0):
+    """Write synthetic CME_price_data.zip, CME_metadata.csv, meta.csv and
+    expiration_dates.csv to directory.
+    Returns number of rows of price data (excluding quirks).
+    """
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(end)
+    # business days, including exchange holidays, which the bundle has to drop
+    sessions = pd.bdate_range(end - pd.DateOffset(years=years), end)
+    roots = root_symbols(roots)
+    contracts = contract_table(roots, contracts_per_root, years, end)
+    prices = price_table(contracts, sessions, rng)
+
+    os.makedirs(directory, exist_ok=True)
+    write_price_zip(os.path.join(directory, 'CME_price_data.zip'), prices,
+                    quirk_lines(contracts, sessions, rng))
+    specs_table(contracts, prices, roots).to_csv(
+        os.path.join(directory, 'CME_metadata.csv'), index=False)
+    meta_table(roots).to_csv(os.path.join(directory, 'meta.csv'), index=False)
+    expiration_table(contracts, end).to_csv(
+        os.path.join(directory, 'expiration_dates.csv'), date_format='%Y-%m-%d')
+    return len(prices)
+
+
+if __name__ == '__main__':
+    args = sys.argv[1:]
+    rows = generate(args[0] if args else 'synthetic', *map(int, args[1:]))
+    print('{} rows of price data generated'.format(rows))
@@ -0,0 +1,308 @@
+"""
+Back-adjusted continuous futures series materialized at ingestion.
+
+History of a ContinuousFuture is assembled by zipline on every request:
+bars of the contracts active in the window are stitched together following
+the rolls and adjustments are applied at every roll inside the window.
+The futures bundle can instead write continuous series of every root symbol,
+following the precomputed roll schedule (see rolls.py), to the continuous/
+directory of the bundle as .npy arrays of shape (sessions, root symbols),
+which are memory-mapped when read:
+
+{roll style}_{offset}_{field}_{adjustment}.npy: open, high, low, close adjusted
+    for all rolls up to the last session of the bundle
+{roll style}_{offset}_factor_{adjustment}.npy: adjustment still to be applied
+    after every session (product of ratios for 'mul', sum of differences for 'add')
+{roll style}_{offset}_volume.npy, {roll style}_{offset}_sid.npy: unadjusted volume
+    and sid of the contract
+sessions.npy: sessions of the bundle (int64 nanoseconds)
+roots.txt: root symbols (column order of the arrays, see symbol_mapper.SymbolRegistry)
+
+As seen at session E, adjusted price at session t is price_adjusted[t] / factor[E]
+('mul') or price_adjusted[t] - factor[E] ('add'), which is the price adjusted
+for rolls after t up to E, as zipline adjusts history, so a history window
+is an array slice scaled or shifted by a single number per root.
+
+Series follow chains built with zipline's default chain predicates
+(see rolls.py), roots for which the asset finder uses other predicates
+are read by DataPortal.
+
+Usage: create ContinuousDataPortal instead of DataPortal.
+"""
+import os
+from glob import glob
+import numpy as np
+import pandas as pd
+from logbook import Logger
+from zipline.assets.continuous_futures import CHAIN_PREDICATES, ContinuousFuture
+from zipline.data.data_portal import DataPortal
+from zipline.data.history_loader import DEFAULT_ASSET_PRICE_DECIMALS
+from zipline.utils.math_utils import number_of_decimal_places
+from .rolls import chain_contracts, custom_chain_roots, install_roll_schedule
+from .symbol_mapper import SymbolRegistry
+
+
+log = Logger(__name__)
+
+CONTINUOUS_DIR = 'continuous'
+
+PRICE_FIELDS = ['open', 'high', 'low', 'close']
+
+
+def series_file(directory, roll_style, offset, name):
+    return os.path.join(directory, '{}_{}_{}.npy'.format(roll_style, offset, name))
+
+
+def last_traded(volume):
+    """Return array of the same shape as volume with index of the last session
+    up to every session with non-zero volume (-1 if none).
+    """
+    index = np.where(volume > 0, np.arange(len(volume))[:, None], -1)
+    return np.maximum.accumulate(index, axis=0)
+
+
+def root_series(sids, starts, chain, bars, offset, adjustments):
+    """Return dict of continuous series of a root symbol following the
+    primary contracts sids from session indices starts.
+    chain: sids of contracts in chain order
+    bars: dict of (sessions, chain) arrays of open, high, low, close, volume
+    """
+    count = len(bars['volume'])
+    position = {sid: i for i, sid in enumerate(chain)}
+    # contract at offset from the primary contract of every period (-1 if none)
+    columns = np.array([position[sid] + offset if position[sid] + offset < len(chain)
+                        else -1 for sid in sids])
+    lengths = np.diff(np.r_[starts, count])
+    column = np.repeat(columns, lengths)
+    rows = np.arange(count)
+    traded = column >= 0
+
+    series = {}
+    raw = {}
+    for field in PRICE_FIELDS + ['volume']:
+        values = np.full(count, np.nan) if field != 'volume' else np.zeros(count)
+        values[traded] = bars[field][rows[traded], column[traded]]
+        raw[field] = values
+    series['volume'] = raw['volume']
+    series['sid'] = np.where(traded, np.asarray(chain)[column], -1).astype(np.int64)
+
+    # adjustments at rolls, from closes on the last traded sessions
+    # before the roll, as in zipline's ContinuousFutureAdjustmentReader
+    last = last_traded(bars['volume'])
+    ratios = np.ones(count)
+    differences = np.zeros(count)
+    for front, back, roll in zip(columns[:-1], columns[1:], starts[1:]):
+        if front < 0 or back < 0:
+            continue
+        front_last, back_last = last[roll - 1, front], last[roll - 1, back]
+        if front_last < 0 or back_last < 0:
+            continue
+        front_close = bars['close'][front_last, front]
+        back_close = bars['close'][back_last, back]
+        difference = back_close - front_close
+        ratio = 1.0 + difference / front_close
+        # adjustments that can't be computed are skipped
+        if np.isfinite(ratio):
+            ratios[roll] = ratio
+            differences[roll] = difference
+
+    # adjustment of rolls after every session
+    factors = {
+        'mul': np.r_[np.cumprod(ratios[::-1])[::-1][1:], 1.0],
+        'add': np.r_[np.cumsum(differences[::-1])[::-1][1:], 0.0],
+    }
+    for adjustment in adjustments:
+        factor = factors[adjustment]
+        series['factor_' + adjustment] = factor
+        for field in PRICE_FIELDS:
+            if adjustment == 'mul':
+                series['{}_{}'.format(field, adjustment)] = raw[field] * factor
+            else:
+                series['{}_{}'.format(field, adjustment)] = raw[field] + factor
+    return series
+
+
+def write_continuous_series(schedule, asset_metadata, reader, output_dir,
+                            roll_styles, offsets, adjustments, show_progress=False,
+                            chain_predicates=CHAIN_PREDICATES):
+    """Write continuous series (see module docstring) of root symbols of
+    the roll schedule for roll styles, offsets and adjustments.
+    reader: daily bar reader of the bundle being written
+    chain_predicates: as passed to roll_schedule
+    Returns number of root symbols.
+    """
+    directory = os.path.join(output_dir, CONTINUOUS_DIR)
+    os.makedirs(directory, exist_ok=True)
+    sessions = reader.sessions
+    schedule = schedule[schedule['roll_style'].isin(roll_styles)]
+    roots = SymbolRegistry(sorted(schedule['root_symbol'].unique()))
+    if show_progress:
+        log.info('Writing continuous series of {} root symbols'.format(len(roots)))
+
+    arrays = {}
+    contracts = asset_metadata.groupby('root_symbol')
+    for root_symbol in roots:
+        chain = chain_contracts(contracts.get_group(root_symbol),
+                                chain_predicates.get(root_symbol)).index.values
+        bars = dict(zip(PRICE_FIELDS + ['volume'], reader.load_raw_arrays(
+            PRICE_FIELDS + ['volume'], sessions[0], sessions[-1], chain)))
+        periods = schedule[schedule['root_symbol'] == root_symbol]
+        for roll_style, rows in periods.groupby('roll_style'):
+            starts = sessions.searchsorted(
+                pd.DatetimeIndex(rows['start_date']).tz_localize(sessions.tz))
+            for offset in offsets:
+                series = root_series(rows['sid'].values, starts, chain, bars,
+                                     offset, adjustments)
+                for name, values in series.items():
+                    key = roll_style, offset, name
+                    if key not in arrays:
+                        # arrays are filled in place on disk, one root at a time
+                        arrays[key] = np.lib.format.open_memmap(
+                            series_file(directory, *key), mode='w+',
+                            dtype=values.dtype, shape=(len(sessions), len(roots)))
+                        arrays[key][:] = np.nan if values.dtype == np.float64 else -1
+                    arrays[key][:, roots.id(root_symbol)] = values
+
+    for array in arrays.values():
+        array.flush()
+    del arrays
+    np.save(os.path.join(directory, 'sessions.npy'),
+            sessions.tz_localize(None).values.astype('datetime64[ns]').view(np.int64))
+    roots.save(os.path.join(directory, 'roots.txt'))
+    return len(roots)
+
+
+class ContinuousSeries:
+    """
+    Reader of continuous series written by write_continuous_series.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.roots = SymbolRegistry.load(os.path.join(directory, 'roots.txt'))
+        self.sessions = np.load(os.path.join(directory, 'sessions.npy'))
+        self._arrays = {}
+        # roots whose chains differ from those the series follow
+        self.excluded = set()
+        self.available = set()
+        for file in glob(os.path.join(directory, '*_*_sid.npy')):
+            roll_style, offset, _ = os.path.basename(file).rsplit('_', 2)
+            self.available.add((roll_style, int(offset)))
+
+    def _array(self, roll_style, offset, name):
+        key = roll_style, offset, name
+        try:
+            return self._arrays[key]
+        except KeyError:
+            array = self._arrays[key] = np.load(
+                series_file(self.directory, roll_style, offset, name), mmap_mode='r')
+            return array
+
+    def covers(self, asset, field):
+        """Whether history of field of asset can be read from the series.
+        """
+        if not isinstance(asset, ContinuousFuture):
+            return False
+        if (asset.roll_style, asset.offset) not in self.available:
+            return False
+        if asset.root_symbol not in self.roots or asset.root_symbol in self.excluded:
+            return False
+        if field in ('volume', 'sid'):
+            return True
+        return os.path.exists(series_file(self.directory, asset.roll_style, asset.offset,
+                                          'factor_{}'.format(asset.adjustment)))
+
+    def history(self, assets, sessions, field, decimals=None):
+        """Return (sessions, assets) array of field of continuous futures
+        as seen at the last session, or None if sessions aren't covered.
+        decimals: number of decimal places to round every asset's values to
+        (as zipline's history windows are rounded, see ContinuousDataPortal)
+        """
+        start = np.searchsorted(self.sessions, sessions[0].value)
+        stop = start + len(sessions)
+        if (stop > len(self.sessions) or self.sessions[start] != sessions[0].value
+                or self.sessions[stop - 1] != sessions[-1].value):
+            return None
+        out = np.empty((len(sessions), len(assets)),
+                       dtype=np.int64 if field == 'sid' else np.float64)
+        groups = {}
+        for i, asset in enumerate(assets):
+            adjustment = asset.adjustment if field in PRICE_FIELDS else None
+            key = asset.roll_style, asset.offset, adjustment
+            groups.setdefault(key, []).append(i)
+        for (roll_style, offset, adjustment), positions in groups.items():
+            columns = [self.roots.id(assets[i].root_symbol) for i in positions]
+            if adjustment is None:
+                out[:, positions] = self._array(roll_style, offset, field)[start:stop, columns]
+                continue
+            values = self._array(roll_style, offset,
+                                 '{}_{}'.format(field, adjustment))[start:stop, columns]
+            factor = self._array(roll_style, offset,
+                                 'factor_' + adjustment)[stop - 1, columns]
+            if adjustment == 'mul':
+                out[:, positions] = values / factor
+            else:
+                out[:, positions] = values - factor
+        if decimals is not None and field != 'sid':
+            decimals = np.asarray(decimals)
+            for places in np.unique(decimals):
+                columns = decimals == places
+                out[:, columns] = out[:, columns].round(places)
+        return out
+
+
+class ContinuousDataPortal(DataPortal):
+    """
+    DataPortal reading daily history of continuous futures from series
+    materialized at ingestion in bundle_dir; other history requests, as well as
+    continuous futures without stored series, are handled by DataPortal.
+    Roll finders are replaced with the roll schedule of the bundle
+    (see rolls.install_roll_schedule), which the series follow.
+    History is rounded to the decimal places of the tick size of the contract
+    with the next auto close date after the last session of the window,
+    the same as zipline's HistoryLoader._decimal_places_for_asset,
+    so that both return the same values.
+
+    Usage:
+    ContinuousDataPortal(bundle_dir, asset_finder, ..., other DataPortal arguments)
+    """
+
+    def __init__(self, bundle_dir, *args, **kwargs):
+        super(ContinuousDataPortal, self).__init__(*args, **kwargs)
+        directory = os.path.join(bundle_dir, CONTINUOUS_DIR)
+        self._continuous_series = None
+        if install_roll_schedule(self, bundle_dir) and os.path.exists(directory):
+            self._continuous_series = ContinuousSeries(directory)
+            self._continuous_series.excluded.update(
+                custom_chain_roots(self.asset_finder, self._continuous_series.roots))
+        else:
+            log.info('No continuous series in {}'.format(bundle_dir))
+
+    def _get_history_daily_window(self,
+                                  assets,
+                                  end_dt,
+                                  bar_count,
+                                  field_to_use,
+                                  data_frequency):
+        series = self._continuous_series
+        if (series is not None and data_frequency == 'daily' and len(assets)
+                and all(series.covers(asset, field_to_use) for asset in assets)):
+            session = self.trading_calendar.minute_to_session_label(end_dt)
+            days_for_window = self._get_days_for_window(session, bar_count)
+            decimals = [self._decimal_places(asset, session) for asset in assets]
+            data = series.history(assets, days_for_window, field_to_use, decimals)
+            if data is not None:
+                return pd.DataFrame(data, index=days_for_window, columns=assets)
+        return super(ContinuousDataPortal, self)._get_history_daily_window(
+            assets, end_dt, bar_count, field_to_use, data_frequency)
+
+    def _decimal_places(self, asset, session):
+        """Decimal places of tick size of the contract of continuous future
+        asset with the next auto close date after session.
+        """
+        contracts = self.asset_finder.get_ordered_contracts(asset.root_symbol)
+        contract = self.asset_finder.retrieve_asset(
+            contracts.contract_before_auto_close(session.value))
+        if contract.tick_size:
+            return number_of_decimal_places(contract.tick_size)
+        return DEFAULT_ASSET_PRICE_DECIMALS
@@ -0,0 +1,186 @@
+"""
+Resumable download of large files.
+
+Files are streamed in chunks to a temporary .part file. If the connection
+fails, download is resumed from the last written byte with a range request.
+Next to the .part file a .part.json sidecar keeps the url, ETag and size
+of the file being downloaded, so that a .part left by an interrupted run
+is resumed by the next run if it's still the same file (If-Range).
+Complete file is verified before it replaces the destination file.
+"""
+import os
+import re
+import json
+import hashlib
+from zipfile import ZipFile, BadZipFile
+import requests
+from logbook import Logger
+
+
+log = Logger(__name__)
+
+CHUNK_SIZE = 2 ** 20
+TIMEOUT = 60
+
+
+class DownloadError(IOError):
+    pass
+
+
+def content_length(r, offset):
+    """Total size of the file being downloaded from response headers or None.
+    """
+    match = re.match(r'bytes \d+-\d+/(\d+)', r.headers.get('Content-Range', ''))
+    if match:
+        return int(match.group(1))
+    if r.status_code == 200 and 'Content-Length' in r.headers:
+        return int(r.headers['Content-Length'])
+    if 'Content-Length' in r.headers:
+        return offset + int(r.headers['Content-Length'])
+
+
+def md5_etag(etag):
+    """Return MD5 hex digest contained in an ETag or None. ETags of files stored
+    in S3 (where Quandl redirects to) are MD5 digests of the file,
+    except for multipart uploads.
+    """
+    if etag:
+        etag = etag.strip('"')
+        if re.match(r'^[0-9a-f]{32}$', etag):
+            return etag
+
+
+def file_md5(file, blocksize=CHUNK_SIZE):
+    digest = hashlib.md5()
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def verify(file, size=None, md5=None, is_zip=False):
+    """Raise DownloadError if file doesn't have expected size, md5 digest
+    or isn't a valid zip file (checked with CRCs of its contents).
+    """
+    actual = os.path.getsize(file)
+    if size is not None and actual != size:
+        raise DownloadError('Downloaded {} of {} bytes'.format(actual, size))
+    if md5 is not None and file_md5(file) != md5:
+        raise DownloadError('MD5 checksum mismatch')
+    if is_zip:
+        try:
+            with ZipFile(file) as z:
+                bad = z.testzip()
+        except BadZipFile as e:
+            raise DownloadError('Invalid zip file: {}'.format(e))
+        if bad is not None:
+            raise DownloadError('CRC check failed for {}'.format(bad))
+
+
+def download_key(url, params=None):
+    """Identify the requested file in the sidecar without storing params
+    (that may contain an API key) in plain text.
+    """
+    digest = hashlib.sha1(json.dumps(params or {}, sort_keys=True).encode())
+    return {'url': url, 'params': digest.hexdigest()}
+
+
+def read_sidecar(part, key):
+    """Return (etag, size) of a .part file left by a previous run
+    if its sidecar matches key and the .part can be resumed, else None.
+    """
+    try:
+        with open(part + '.json') as f:
+            info = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if any(info.get(name) != value for name, value in key.items()):
+        return None
+    etag, size = info.get('etag'), info.get('size')
+    # If-Range requires a strong validator
+    if not etag or etag.startswith('W/'):
+        return None
+    if size is not None and os.path.getsize(part) > size:
+        return None
+    return etag, size
+
+
+def write_sidecar(part, key, etag, size):
+    info = dict(key, etag=etag, size=size)
+    with open(part + '.json', 'w') as f:
+        json.dump(info, f)
+
+
+def remove_part(part):
+    for file in (part, part + '.json'):
+        if os.path.exists(file):
+            os.remove(file)
+
+
+def stream_download(url, filename, params=None, retries=5, show_progress=False,
+                    session=None, chunk_size=CHUNK_SIZE):
+    """Download url to filename in up to `retries` attempts.
+    Failed attempts are resumed from the last downloaded byte, also across
+    runs (see read_sidecar); if the server doesn't support range requests
+    or the file has changed in the meantime (If-Range), download starts over. Downloaded file is verified
+    (size, MD5 from ETag if available, zip CRCs for .zip files) and atomically
+    moved to filename.
+    Returns number of attempts taken.
+    """
+    session = session or requests.Session()
+    part = filename + '.part'
+    key = download_key(url, params)
+    etag = None
+    if os.path.exists(part):
+        previous = read_sidecar(part, key)
+        if previous is None:
+            # can't tell whether the .part belongs to the requested file
+            remove_part(part)
+        else:
+            etag = previous[0]
+            if show_progress:
+                log.info('Resuming download of {} bytes left by previous run'.format(
+                    os.path.getsize(part)))
+    for attempt in range(1, retries + 1):
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {}
+        if offset:
+            headers['Range'] = 'bytes={}-'.format(offset)
+            if etag:
+                headers['If-Range'] = etag
+        try:
+            with session.get(url, params=params, headers=headers, stream=True,
+                             timeout=TIMEOUT) as r:
+                if r.status_code == 416:
+                    # nothing left to download
+                    size = offset
+                else:
+                    r.raise_for_status()
+                    if r.status_code != 206:
+                        # full content
+                        offset = 0
+                    etag = r.headers.get('ETag', etag)
+                    size = content_length(r, offset)
+                    write_sidecar(part, key, etag, size)
+                    if show_progress:
+                        log.info('Downloading {} bytes{}'.format(
+                            '?' if size is None else size,
+                            ' from byte {}'.format(offset) if offset else ''))
+                    with open(part, 'ab' if offset else 'wb') as f:
+                        for chunk in r.iter_content(chunk_size):
+                            f.write(chunk)
+            verify(part, size, md5_etag(etag), filename.endswith('.zip'))
+        except DownloadError as e:
+            log.warn('Download attempt {} failed verification: {}'.format(attempt, e))
+            # incomplete file can be resumed, corrupt one has to be downloaded again
+            if size is None or os.path.getsize(part) >= size:
+                remove_part(part)
+            continue
+        except (requests.RequestException, IOError) as e:
+            log.warn('Download attempt {} failed: {}'.format(attempt, e))
+            continue
+        os.replace(part, filename)
+        remove_part(part)
+        return attempt
+    # keep .part and its sidecar to be resumed by the next run
+    raise DownloadError('Failed to download {} after {} attempts'.format(url, retries))
@@ -1,13 +1,19 @@
 import os
 import sys
 import time
+import threading
 import calendar as cal
 from io import BytesIO
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
 import requests
+from requests.adapters import HTTPAdapter
 from requests_html import HTMLSession
 import pandas as pd
 from logbook import Logger, FileHandler, StreamHandler
+from .settings import (CME_WORKERS, CME_RATE, CME_BURST, CME_BACKOFF, CME_RETRIES,
+                       CME_URL, CME_CACHE_TTL)
 
 
 stream_handler = StreamHandler(
@@ -21,6 +27,45 @@ log = Logger(__name__)
 #file_handler.push_application()
 
 
+class TokenBucket:
+    """
+    Thread-safe rate limiter allowing on average `rate` calls of acquire per second
+    and bursts of up to `capacity` calls.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available and take it.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.updated:
+                    self.tokens = min(self.capacity,
+                                      self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.updated - now
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Withhold tokens from all callers for given number of seconds.
+        """
+        with self.lock:
+            self.tokens = 0
+            self.updated = max(self.updated, time.monotonic() + seconds)
+
+
 class ExpirationDownloader:
     """
     Download contract expiry dates from CME website.
@@ -29,6 +74,9 @@ class ExpirationDownloader:
     df: dataframe read from csv file downloaded from quandl
     download: False - use file from disk, True - download file form CME
     show_progress: zipline variable to be passed by caller (or not)
+    workers, rate, burst, backoff, retries, base_url: see CME settings in settings.py
+    cache_ttl: days for which cached calendars are used without revalidation,
+    None - don't cache
 
     calling without parameters: use file from disk
 
@@ -38,12 +86,24 @@ class ExpirationDownloader:
     """
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     FILENAME = os.path.join(BASE_DIR, 'expiration_dates.csv')
+    CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'calendars')
+    TIMEOUT = 30
     downloaded_tables = []
     attempts = []
-    counter = 0
-        
-    def __init__(self, df=None, download=False, show_progress=False):
+
+    def __init__(self, df=None, download=False, show_progress=False,
+                 workers=CME_WORKERS, rate=CME_RATE, burst=CME_BURST,
+                 backoff=CME_BACKOFF, retries=CME_RETRIES, base_url=CME_URL,
+                 cache_ttl=CME_CACHE_TTL):
         self.show_progress = show_progress
+        self.workers = workers
+        self.backoff = backoff
+        self.retries = retries
+        self.base_url = base_url
+        self.cache_ttl = cache_ttl
+        self.bucket = TokenBucket(rate, burst)
+        # set when CME website can't be reached, cached calendars are used from then on
+        self.offline = False
         if df is not None:
             self.data = df.copy()
         self.router(download)
@@ -62,35 +122,162 @@ class ExpirationDownloader:
             if self.show_progress:
                 log.info('Expiration dates read from disk.')
         
+    def make_session(self):
+        """
+        Session shared by all download threads with a connection pool large enough
+        to keep a connection open for every thread.
+        """
+        session = HTMLSession()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.workers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def site_url(self, url):
+        """
+        Url on base_url host for a CME url or a link relative to CME website.
+        """
+        parts = urlsplit(url)
+        return urljoin(self.base_url, parts._replace(scheme='', netloc='').geturl())
+
+    def request(self, url, headers=None):
+        """
+        Get url within rate limit.
+        If CME blocks access (status 403) requests from all threads are paused
+        with exponential backoff and the request is retried.
+        """
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            r = self.session.get(url, headers=headers, timeout=self.TIMEOUT)
+            if r.status_code != 403:
+                break
+            if attempt == self.retries:
+                log.error('CME blocked access to their website, giving up on: {}'.format(url))
+                break
+            delay = self.backoff * 2 ** attempt
+            log.warn('CME temporarily blocked access to their website due to too many '
+                     'requests. Pausing downloads for {} seconds.'.format(delay))
+            self.bucket.pause(delay)
+        return r
+
+    def cache_file(self, root):
+        return os.path.join(self.CACHE_DIR, '{}.pkl'.format(root))
+
+    def load_cached(self, root):
+        """
+        Return cache entry for root symbol or None if there isn't any.
+        Entry is a dict with keys: table (parsed calendar), link (excel file url),
+        fetched (time of the last download or revalidation), etag, last_modified.
+        """
+        if self.cache_ttl is None:
+            return
+        try:
+            return pd.read_pickle(self.cache_file(root))
+        except Exception:
+            return
+
+    def store_cached(self, root, entry):
+        if self.cache_ttl is None:
+            return
+        file = self.cache_file(root)
+        try:
+            os.makedirs(self.CACHE_DIR, exist_ok=True)
+            pd.to_pickle(entry, file + '.tmp')
+            os.replace(file + '.tmp', file)
+        except OSError as e:
+            log.warn('Failed to cache calendar for {}: {}'.format(root, e))
+
+    def is_fresh(self, entry):
+        return time.time() - entry['fetched'] < self.cache_ttl * 86400
+
     def excel_downloader(self, root, url):
+        """
+        Get table with expiration dates for root symbol from cache or CME website.
+        """
+        entry = self.load_cached(root)
+        if entry is not None and (self.offline or self.is_fresh(entry)):
+            table = entry['table']
+        else:
+            try:
+                table = self.download_table(root, url, entry)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.offline = True
+                log.warn('Failed to connect to CME website: {}'.format(e))
+                table = None if entry is None else entry['table']
+        if table is not None:
+            # remember which symbols have already been downloaded to prevent another request
+            self.downloaded_tables.append(root)
+        return table
+
+    def download_table(self, root, url, entry=None):
         """
         Dowload excel file with expiration dates from CME website.
+        Cached entry is revalidated with its ETag and Last-Modified date first
+        and returned unless the file has changed.
+        If download fails, cached (stale) table is returned. Connection errors
+        and timeouts are raised, as they take the downloader offline.
         """
+        stale = None if entry is None else entry['table']
+        if entry is not None:
+            headers = {}
+            if entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+            if entry['last_modified']:
+                headers['If-Modified-Since'] = entry['last_modified']
+            try:
+                a = self.request(self.site_url(entry['link']), headers)
+            except (requests.ConnectionError, requests.Timeout):
+                raise
+            except requests.RequestException as e:
+                log.warn('Failed to revalidate excel file: {}, error: {}'.format(
+                    entry['link'], e))
+                return stale
+            if a.status_code == 304:
+                entry['fetched'] = time.time()
+                self.store_cached(root, entry)
+                return stale
+            if a.ok:
+                return self.parse_table(root, entry['link'], a, stale)
+            # link may have changed, look it up again on calendar page
+
         # get excel file link
-        session = HTMLSession()
-        r = session.get(url)
         try:
+            r = self.request(self.site_url(url))
             r.raise_for_status()
             link = r.html.find('.cmeButtonDownloadExcel', first=True).links.pop()
+        except (requests.ConnectionError, requests.Timeout):
+            raise
         except Exception as e:
             log.warn('Failed to download calendar page: {}, error: {}'.format(url, e))
-            if r.status_code == 403:
-                log.error('CME temporarily blocked your access to their website due to too many requests. Try again in 15 minutes.')
-                sys.exit()
-            return
-        
-        a = requests.get('https://www.cmegroup.com{}'.format(link))
+            return stale
+
+        try:
+            a = self.request(self.site_url(link))
+        except (requests.ConnectionError, requests.Timeout):
+            raise
+        except requests.RequestException as e:
+            log.warn('Failed to download excel file: {}, error: {}'.format(link, e))
+            return stale
+        return self.parse_table(root, link, a, stale)
+
+    def parse_table(self, root, link, a, stale=None):
+        """
+        Parse excel file downloaded from link and cache the result.
+        """
         try:
             a.raise_for_status()
             table =  pd.read_excel(BytesIO(a.content), header=3)
             # change root symbols used by CME to Quandl roots
             table['Product Code'] = table['Product Code'].apply(lambda x: root + x[-3:])
-            # remember which symbols have already been downloaded to prevent another request
-            self.downloaded_tables.append(root)
-
-            return table
         except:
             log.warn('Failed to download excel file: {}, error: {}'.format(link, a.status_code))
+            return stale
+        self.store_cached(root, {'table': table,
+                                 'link': link,
+                                 'fetched': time.time(),
+                                 'etag': a.headers.get('ETag'),
+                                 'last_modified': a.headers.get('Last-Modified')})
+        return table
     
     def get_specs(self):
         """Process Quandl specs into workable DataFrame.
@@ -132,21 +319,19 @@ class ExpirationDownloader:
         if self.show_progress:
             log.info('Downloading expiration dates from CME website')
         self.get_specs()
-        df_list = []
-        for row in self.data.iterrows():
-            if row[1][6] in self.downloaded_tables:
-                continue
-            else:
-                # for debugging only
-                self.attempts.append(row[1][6])
-                self.counter += 1
-                if self.counter > 250:
-                    # throtling to prevent CME website ban
-                    time.sleep(10)
-                    self.counter = 0
-                df_list.append(self.excel_downloader(row[1][6], row[1][2]))
+        roots = self.data.drop_duplicates('root_symbol')
+        roots = roots[~roots['root_symbol'].isin(self.downloaded_tables)]
+        # for debugging only
+        self.attempts.extend(roots['root_symbol'])
+
+        self.session = self.make_session()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                df_list = list(executor.map(self.excel_downloader,
+                                            roots['root_symbol'], roots['description']))
+        finally:
+            self.session.close()
 
-        
         big_df = pd.concat(df_list)
         big_df.columns = map(str.lower, big_df.columns)
         big_df.rename(columns={'product code': 'symbol'}, inplace=True)  
@@ -1,16 +1,30 @@
 import os
 import sys
+import hashlib
 import numpy as np
 import pandas as pd
-from six import iteritems
+from pandas.api.types import is_categorical_dtype, union_categoricals
 from io import BytesIO
 import requests
-from zipfile import ZipFile
 import quandl
 from logbook import Logger, StreamHandler, FileHandler
+from zipline.assets.continuous_futures import CHAIN_PREDICATES
 from zipline.data.bundles import core as bundles
 from .expiration_downloader import ExpirationDownloader
-from .settings import DOWNLOAD, contracts
+from .price_index import open_price_file, remove_price_index
+from .download import stream_download
+from .instrumentation import IngestReport, stage, count_bars
+from .rolls import collect_volumes, roll_schedule, write_roll_schedule
+from .continuous import write_continuous_series
+from .readers import FutureDailyBarReader
+from .incremental import (BAR_COLUMNS, price_to_fixed, fixed_to_price,
+                          previous_ingestion, load_previous_metadata,
+                          load_previous_reader, previous_bars)
+from .settings import (DOWNLOAD, INCREMENTAL, CHUNKSIZE, CACHE_RAW_DATA,
+                       SPARSE_BARS, INGEST_REPORT, COMPACT_DTYPES, CSV_BACKEND,
+                       INDEX_PRICE_FILE, ROLL_SCHEDULE, CONTINUOUS_SERIES,
+                       CONTINUOUS_ROLL_STYLES, CONTINUOUS_OFFSETS, CONTINUOUS_ADJUSTMENTS,
+                       QUANDL_URL, contracts)
 
 
 stream_handler = StreamHandler(
@@ -22,11 +36,20 @@ log = Logger(__name__)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 # filename for data downloaded from Quandl
 QUANDL_ZIP_FILE = os.path.join(BASE_DIR, 'CME_price_data.zip')
+# filename for the last day's data downloaded from Quandl
+QUANDL_PARTIAL_ZIP_FILE = os.path.join(BASE_DIR, 'CME_price_data_partial.zip')
 # This file must contain: multiplier, tick_size, sector, sub-sector
 # for every root symbol
 META_FILE = os.path.join(BASE_DIR, 'meta.csv')
 # meta data from Quandl
 QUANDL_SPECS_FILE = os.path.join(BASE_DIR, 'CME_metadata.csv')
+# directory for parsed price data cached between ingestions
+RAW_DATA_CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+# bump whenever parsing logic changes to invalidate existing cache files
+RAW_DATA_CACHE_VERSION = '1'
+
+# ingestion report written to the bundle directory
+INGEST_REPORT_FILE = 'ingest_report.json'
 
 
 def get_meta_df(file=META_FILE):
@@ -44,83 +67,302 @@ def convert_symbol(s):
     return s[:-4] + s[-2:]
 
 
+def get_root_filter():
+    """Return roots of contracts chosen in settings.py in Quandl format
+    (ie. without leading underscore) or None if all contracts are to be ingested.
+    """
+    if contracts:
+        return [c[1:] if c.startswith('_') else c for c in contracts]
+
+
+def clean_data_table(df, roots=None):
+    """Remove rows that are not futures prices from a (part of) Quandl data table,
+    convert symbols to short style and keep only contracts with given roots.
+    """
+    # drop option codes which are mistakenly included in Quandl file
+    df = df[df['symbol'].str.len() <= 8]
+    # drop various indexes included in Quandl file
+    df = df[~df['symbol'].str.contains('INDEX', regex=False, na=False)]
+    # known bad data in Quandl file
+    df = df[df['symbol'] != 'SH1920']
+    # placeholders were only relevant for rows with option data, which are now removed
+    # (pyarrow backend skips option rows while parsing and has no placeholders)
+    df = df.drop(['x', 'y'], axis=1, errors='ignore')
+    df['symbol'] = df['symbol'].str[:-4] + df['symbol'].str[-2:]
+
+    if roots is not None:
+        # filter only contracts chosen in settings.py
+        df = df[df['symbol'].str[:-3].isin(roots)]
+
+    return df
+
+
+# columns of Quandl price table
+CSV_COLUMNS = ['symbol', 'date', 'open', 'high', 'low', 'end', 'change', 'close',
+               'volume', 'open_interest']
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close']
+
+
+def skip_invalid_row(row):
+    return 'skip'
+
+
+# approximate size in bytes of a row of Quandl price table
+CSV_ROW_BYTES = 64
+
+
+def arrow_frame(batch):
+    """Convert a batch (or table) of Quandl data table read as strings to
+    a DataFrame of parsed dates and numbers. Rows whose date or numbers
+    can't be parsed are skipped.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    try:
+        columns = [batch.column('symbol'),
+                   pc.strptime(batch.column('date'), format='%Y-%m-%d', unit='ns')]
+        columns += [pc.cast(batch.column(c), pa.float64()) for c in CSV_COLUMNS[2:]]
+        df = pa.Table.from_arrays(columns, names=CSV_COLUMNS).to_pandas()
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # some values are malformed, parse with pandas to find them
+        raw = batch.to_pandas()
+        df = pd.DataFrame({'symbol': raw['symbol']})
+        df['date'] = pd.to_datetime(raw['date'], format='%Y-%m-%d', errors='coerce')
+        invalid = df['date'].isnull()
+        for column in CSV_COLUMNS[2:]:
+            df[column] = pd.to_numeric(raw[column], errors='coerce').astype(np.float64)
+            invalid |= df[column].isnull() & raw[column].notnull()
+        log.warn('Skipping {} rows with invalid values'.format(invalid.sum()))
+        df = df[~invalid]
+    for column in ['volume', 'open_interest']:
+        if not df[column].isnull().any():
+            df[column] = df[column].astype(np.int64)
+    return df
+
+
+def read_arrow_csv(table_file, chunksize=None):
+    """Generate parts of Quandl data table decoded by pyarrow's multi-threaded
+    csv reader. With chunksize, the file is streamed in blocks of about chunksize
+    rows and one DataFrame is generated per block, so peak memory is bound
+    as with the pandas parser; without it the whole table is decoded at once.
+    Rows with a different number of columns than the price table
+    (option rows with two extra columns, malformed rows) and rows with
+    dates or numbers that can't be parsed are skipped.
+    Volume and open interest are integers in parts without missing values,
+    as they would be when parsed by pandas.
+    """
+    import pyarrow as pa
+    from pyarrow import csv
+
+    read_options = csv.ReadOptions(column_names=CSV_COLUMNS, use_threads=True)
+    if chunksize:
+        read_options.block_size = chunksize * CSV_ROW_BYTES
+    parse_options = csv.ParseOptions(invalid_row_handler=skip_invalid_row)
+    # values are parsed from strings by arrow_frame, which can skip invalid ones
+    convert_options = csv.ConvertOptions(
+        column_types={column: pa.string() for column in CSV_COLUMNS},
+        strings_can_be_null=True)
+    if chunksize:
+        batches = csv.open_csv(table_file, read_options=read_options,
+                               parse_options=parse_options,
+                               convert_options=convert_options)
+    else:
+        batches = [csv.read_csv(table_file, read_options=read_options,
+                                parse_options=parse_options,
+                                convert_options=convert_options)]
+    empty = True
+    for batch in batches:
+        empty = False
+        yield arrow_frame(batch)
+    if empty:
+        # streaming reader generates no batches if all rows are skipped
+        yield arrow_frame(batches.schema.empty_table())
+
+
+def compact_data_table(df):
+    """Convert (a part of) cleaned data table to compact dtypes:
+    categorical symbols, prices as fixed point int32 (see price_to_fixed),
+    volume and open interest as uint32 with missing values set to zero.
+    Columns not used by the bar writer (end, change) are dropped.
+    """
+    df = df.drop(['end', 'change'], axis=1)
+    for column in PRICE_COLUMNS:
+        df[column] = price_to_fixed(df[column].values)
+    for column in ['volume', 'open_interest']:
+        df[column] = df[column].fillna(0).astype(np.uint32)
+    df['symbol'] = df['symbol'].astype('category')
+    return df
+
+
+def concat_data_tables(frames):
+    """Concatenate parts of data table keeping symbols categorical if they are.
+    """
+    if not is_categorical_dtype(frames[0]['symbol']):
+        return pd.concat(frames, ignore_index=True)
+    symbols = union_categoricals([df['symbol'] for df in frames], sort_categories=True)
+    df = pd.concat([df.drop('symbol', axis=1) for df in frames], ignore_index=True)
+    df.insert(0, 'symbol', symbols)
+    return df
+
+
 def load_data_table(file,
                     index_col=None,
-                    show_progress=False):
+                    show_progress=False,
+                    chunksize=CHUNKSIZE,
+                    compact=COMPACT_DTYPES,
+                    backend=CSV_BACKEND,
+                    use_index=INDEX_PRICE_FILE):
     """ Load data table from zip file provided by Quandl.
+    If chunksize is given, the file is parsed in chunks of that many rows
+    and only rows surviving filtering are kept in memory.
+    If compact is True, data is converted to compact dtypes (see compact_data_table).
+    backend: 'pandas' or 'pyarrow' (see read_arrow_csv) csv parser
+    If use_index is True and contracts are selected in settings.py, only rows
+    of selected contracts are read (see price_index.py).
     """
-    with ZipFile(file) as zip_file:
-        file_names = zip_file.namelist()
-        assert len(file_names) == 1, "Expected a single file from Quandl."
-        prices = file_names.pop()
-        with zip_file.open(prices) as table_file:
-            if show_progress:
-                log.info('Parsing raw data')
-            df = pd.read_csv(
+    if backend == 'pyarrow':
+        try:
+            import pyarrow.csv
+        except ImportError:
+            log.warn('pyarrow is not installed, CME data will be parsed with pandas')
+            backend = 'pandas'
+
+    roots = get_root_filter()
+    selected = roots if use_index else None
+    if not use_index:
+        # decompressed copy of the price file is only used by the index
+        remove_price_index(file)
+    with stage('parse') as counts, \
+            open_price_file(file, selected, show_progress) as table_file:
+        if show_progress:
+            log.info('Parsing raw data')
+        if backend == 'pyarrow':
+            reader = read_arrow_csv(table_file, chunksize)
+        else:
+            reader = pd.read_csv(
                 table_file,
                 error_bad_lines=False,
                 header=None,
                 parse_dates=[1],
-                names=[
-                    'symbol',
-                    'date',
-                    'open',
-                    'high',
-                    'low',
-                    'end',
-                    'change',
-                    'close',
-                    'volume',
-                    'open_interest',
+                chunksize=chunksize,
+                names=CSV_COLUMNS + [
                     'x',  # placeholder to ensure parsing without errors
                     'y',  # placeholder
                 ],
             )
-    # drop option codes which are mistakenly included in Quandl file
-    df.drop(df[df['symbol'].str.len() > 8].index, inplace=True)
-    # drop various indexes included in Quandl file
-    df.drop(df[df['symbol'].str.contains(
-        'INDEX', regex=False) == True].index, inplace=True)
-    # placeholders were only relevant for rows with option data, which are now removed
-    del df['x']
-    del df['y']
-    # known bad data in Quandl file
-    df.drop(df[df['symbol'] == 'SH1920'].index, inplace=True)
-    df['symbol'] = df['symbol'].apply(convert_symbol)
+            if chunksize is None:
+                reader = [reader]
+        frames = [clean_data_table(chunk, roots) for chunk in reader]
+        if compact:
+            frames = [compact_data_table(df) for df in frames]
+        df = concat_data_tables(frames)
+        counts['rows'] = len(df)
 
-    global contracts
-    if contracts:
-        # filter only contracts chosen in settings.py
-        contracts = [c[-1] if c.startswith('_') else c for c in contracts]
-        df['root'] = df['symbol'].apply(lambda x: x[:-3])
-        df = df[df['root'].isin(contracts)]
-        del df['root']
-        df.reset_index(drop=True, inplace=True)
+    return df.reset_index(drop=True)
+
+
+def file_digest(file, blocksize=2 ** 20):
+    """Return sha256 hex digest of file content.
+    """
+    digest = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(blocksize), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def raw_data_cache_file(file):
+    """Return path of the cache file for data table parsed from given zip file.
+    File name is derived from zip file content, contract filter and parsing
+    settings (dtypes, csv parser) so that any change to them invalidates the cache.
+    """
+    roots = get_root_filter()
+    key = hashlib.sha256()
+    key.update(RAW_DATA_CACHE_VERSION.encode())
+    key.update(file_digest(file).encode())
+    key.update(','.join(sorted(roots)).encode() if roots is not None else b'*')
+    key.update(b'compact' if COMPACT_DTYPES else b'')
+    # parsers differ in e.g. dtypes of parsed columns and skipped rows
+    key.update(CSV_BACKEND.encode())
+    return os.path.join(RAW_DATA_CACHE_DIR,
+                        'raw_data_{}.feather'.format(key.hexdigest()[:16]))
+
+
+def load_cached_data_table(file, show_progress=False):
+    """ Load data table from columnar cache if it's up to date with zip file,
+    otherwise parse zip file and refresh the cache.
+    """
+    try:
+        from pyarrow import feather
+    except ImportError:
+        log.warn('pyarrow is not installed, parsed data will not be cached')
+        return load_data_table(file, show_progress=show_progress)
+
+    cache_file = raw_data_cache_file(file)
+    if os.path.exists(cache_file):
+        if show_progress:
+            log.info('Reading parsed CME data from cache')
+        with stage('read cache') as counts:
+            df = feather.read_feather(cache_file, memory_map=True)
+            counts['rows'] = len(df)
+        return df
 
+    df = load_data_table(file, show_progress=show_progress)
+
+    if not os.path.isdir(RAW_DATA_CACHE_DIR):
+        os.makedirs(RAW_DATA_CACHE_DIR)
+    # only one version of the data is ever useful
+    for f in os.listdir(RAW_DATA_CACHE_DIR):
+        if f.startswith('raw_data_'):
+            os.remove(os.path.join(RAW_DATA_CACHE_DIR, f))
+    tmp_file = cache_file + '.tmp'
+    feather.write_feather(df, tmp_file)
+    os.replace(tmp_file, cache_file)
+    if show_progress:
+        log.info('Parsed CME data saved to cache')
     return df
 
 
-def fetch_data_table(download=True, show_progress=False, retries=5):
-    """ Fetch CME data table from Quandl
+def download_data_table(filename, download_type='complete', show_progress=False,
+                        retries=5):
+    """ Download CME data table from Quandl into filename.
+    download_type: 'complete' for all data, 'partial' for the last day's data only
+    Interrupted downloads are resumed, filename is replaced only by a complete
+    and verified file (see download.py).
     """
-    if download:
-        for _ in range(retries):
-            try:
-                if show_progress:
-                    log.info('Downloading CME data')
-                quandl.bulkdownload('CME', filename=QUANDL_ZIP_FILE)
-                break
-            except Exception:
-                log.exception(
-                    "Exception raised reading Quandl data. Retrying.")
-        else:
+    with stage('download {}'.format(download_type)) as counts:
+        if show_progress:
+            log.info('Downloading CME data')
+        try:
+            counts['attempts'] = stream_download(
+                '{}/databases/CME/data'.format(QUANDL_URL),
+                filename,
+                params={'api_key': quandl.ApiConfig.api_key,
+                        'download_type': download_type},
+                retries=retries,
+                show_progress=show_progress)
+        except IOError:
             raise ValueError(
                 "Failed to download Quandl data after %d attempts." % (retries)
             )
+        counts['bytes'] = os.path.getsize(filename)
+
+
+def fetch_data_table(download=True, show_progress=False, retries=5):
+    """ Fetch CME data table from Quandl
+    """
+    if download:
+        download_data_table(QUANDL_ZIP_FILE, show_progress=show_progress,
+                            retries=retries)
     else:
         if show_progress:
             log.info('Reading CME data from disk')
 
+    if CACHE_RAW_DATA:
+        return load_cached_data_table(QUANDL_ZIP_FILE, show_progress)
+
     return load_data_table(
         file=QUANDL_ZIP_FILE,
         index_col=None,
@@ -128,6 +370,35 @@ def fetch_data_table(download=True, show_progress=False, retries=5):
     )
 
 
+def fetch_new_data_table(last_session, next_session, download=True,
+                         show_progress=False, retries=5):
+    """ Fetch CME data for dates after last_session.
+    If download is True, only the last day's data is downloaded, unless it doesn't
+    reach back to next_session, in which case complete data is downloaded.
+    """
+    df = None
+    if download:
+        download_data_table(QUANDL_PARTIAL_ZIP_FILE, 'partial', show_progress, retries)
+        df = load_data_table(QUANDL_PARTIAL_ZIP_FILE, show_progress=show_progress,
+                             use_index=False)
+        if len(df) and df['date'].min() > next_session:
+            log.info('Partial CME data starts on {}, downloading complete data'.format(
+                df['date'].min().date()))
+            df = None
+    if df is None:
+        df = fetch_data_table(download, show_progress, retries)
+    return df[df['date'] > last_session].reset_index(drop=True)
+
+
+def empty_data_table():
+    """Return a data table without any rows, with dtypes of a cleaned data table.
+    """
+    df = pd.DataFrame({column: pd.Series(dtype=np.float64) for column in CSV_COLUMNS})
+    df['symbol'] = df['symbol'].astype(object)
+    df['date'] = df['date'].astype('datetime64[ns]')
+    return df
+
+
 def fetch_quandl_specs_table(api_key, download=True, show_progress=False):
     """
     Return quandl spec file with a list of all available contracts.
@@ -138,8 +409,8 @@ def fetch_quandl_specs_table(api_key, download=True, show_progress=False):
         if show_progress:
             log.info('Downloading metadata file from Quandl')
 
-        r = requests.get('https://www.quandl.com/api/v3/databases/CME/metadata?api_key={}'
-                         .format(api_key))
+        r = requests.get('{}/databases/CME/metadata?api_key={}'
+                         .format(QUANDL_URL, api_key))
         r.raise_for_status()
         df = pd.read_csv(BytesIO(r.content), compression='zip',
                          parse_dates=['from_date', 'to_date'])
@@ -149,6 +420,15 @@ def fetch_quandl_specs_table(api_key, download=True, show_progress=False):
         return pd.read_csv(QUANDL_SPECS_FILE, parse_dates=['from_date', 'to_date'])
 
 
+def get_contract_names(quandl_specs):
+    """Return Series of contract names from Quandl specs indexed by short style symbols.
+    """
+    specs = quandl_specs[['code', 'name']]
+    names = pd.Series(specs['name'].values,
+                      index=specs['code'].str[:-4] + specs['code'].str[-2:])
+    return names[~names.index.duplicated(keep='last')]
+
+
 def gen_asset_metadata(raw_data,
                        quandl_specs,
                        expiration,
@@ -157,30 +437,23 @@ def gen_asset_metadata(raw_data,
     if show_progress:
         log.info('Generating asset metadata')
 
-    data = raw_data.groupby(
-        by='symbol'
-    ).agg(
-        {'date': [np.min, np.max]}
-    )
-
+    # unused categories of compact data tables are dropped
+    data = raw_data.groupby(by='symbol')['date'].agg(['min', 'max']).dropna()
+    data.index = data.index.astype(object)
     data.reset_index(inplace=True)
-    data.columns = data.columns.get_level_values(1)
-    data.rename(columns={'': 'symbol', 'amin': 'start_date', 'amax': 'end_date'},
-                inplace=True)
+    data.rename(columns={'min': 'start_date', 'max': 'end_date'}, inplace=True)
     data['first_traded'] = data['start_date']
 
     meta = get_meta_df(meta_file)
 
-    data['root_symbol'] = [s[:-3] for s in data.symbol.unique()]
-    names = quandl_specs['name']
-    names.index = quandl_specs['code'].apply(convert_symbol)
-    data['asset_name'] = data.symbol.apply(lambda x: names.loc[x])
+    data['root_symbol'] = data['symbol'].str[:-3]
+    data['asset_name'] = data['symbol'].map(get_contract_names(quandl_specs))
 
     # include only contracts for which metadata is available
     data = data.merge(meta, on='root_symbol', how='inner')
     # precede single character roots with _, eg. C (corn) becomes _C
-    data['root_symbol'] = data['root_symbol'].apply(
-        lambda x: '_' + x if len(x) < 2 else x)
+    single = data['root_symbol'].str.len() < 2
+    data.loc[single, 'root_symbol'] = '_' + data.loc[single, 'root_symbol']
 
     # DataFrame for mapping expiry dates, which uses data read from CME website where available
     # if not available: end_date
@@ -197,17 +470,180 @@ def gen_asset_metadata(raw_data,
     return data.sort_values(by=['auto_close_date']).reset_index(drop=True)
 
 
+def gen_root_symbols(asset_metadata):
+    """Generate root_symbols table from attributes of the first contract of every root.
+    """
+    first = asset_metadata.drop_duplicates('root_symbol').reset_index(drop=True)
+    root_symbols = first[['root_symbol']].copy()
+    root_symbols['root_symbol_id'] = root_symbols.index.values
+    root_symbols['sector'] = first['sector'].str.cat(first['sub_sector'], sep='/')
+    root_symbols['exchange'] = first['exchange']
+    root_symbols['description'] = first['name']
+    return root_symbols
+
+
+def sort_pricing_data(data, sessions, compact=False):
+    """Sort data by symbol and date and align it with sessions.
+    compact: whether data is a compact data table (see compact_data_table)
+    with prices as fixed point numbers
+
+    Returns a tuple: (columns, values, positions, blocks), where:
+    columns: names of bar columns
+    values: 2D float array of bar values with missing values set to zero
+    positions: index of each row of values in sessions
+    blocks: dict mapping symbol to (start, stop) rows of its data in values
+    """
+    columns = [c for c in data.columns if c not in ('symbol', 'date')]
+    data = data.sort_values(['symbol', 'date'], kind='mergesort')
+
+    # position of each row in sessions, rows for non-sessions are dropped
+    positions = sessions.get_indexer(data['date'])
+    in_sessions = positions >= 0
+    positions = positions[in_sessions]
+    values = data[columns].values.astype(np.float64)[in_sessions]
+    values[np.isnan(values)] = 0.0
+    # prices of compact data tables are fixed point numbers, prices parsed
+    # without a decimal point are integers too, so dtype doesn't tell them apart
+    if compact:
+        for i, column in enumerate(columns):
+            if column in PRICE_COLUMNS:
+                values[:, i] = fixed_to_price(values[:, i])
+
+    if is_categorical_dtype(data['symbol']):
+        symbols = data['symbol'].cat.codes.values[in_sessions]
+        labels = np.asarray(data['symbol'].cat.categories)
+    else:
+        symbols = data['symbol'].values[in_sessions]
+        labels = None
+
+    # every symbol's data is a contiguous block of sorted arrays
+    boundaries = np.flatnonzero(symbols[1:] != symbols[:-1]) + 1
+    starts = np.r_[0, boundaries]
+    stops = np.r_[boundaries, len(symbols)]
+    keys = symbols[starts[starts < len(symbols)]]
+    if labels is not None:
+        keys = labels[keys]
+    blocks = dict(zip(keys, zip(starts, stops)))
+
+    return columns, values, positions, blocks
+
+
+def lifetime_spans(asset_metadata, sessions):
+    """Return (first, count) arrays of the first session and the number of sessions
+    within every asset's [start_date, end_date].
+    Assets without any sessions in their lifetime get a single session,
+    as bar writer requires at least one bar per asset.
+    """
+    sessions = sessions.tz_localize(None)
+    first = sessions.searchsorted(asset_metadata['start_date'].values)
+    last = sessions.searchsorted(asset_metadata['end_date'].values, side='right') - 1
+    first = np.minimum(first, len(sessions) - 1)
+    count = np.maximum(last - first + 1, 1)
+    return first, count
+
+
+def fill_bars(values, positions, block, count, first=0):
+    """Return array of bars for count sessions starting at session first
+    from a block of sorted data.
+    """
+    start, stop = block
+    bars = np.zeros((count, values.shape[1]))
+    bars[positions[start:stop] - first] = values[start:stop]
+    return bars
+
+
 def parse_pricing_and_vol(data,
                           sessions,
-                          symbol_map):
-    for asset_id, symbol in iteritems(symbol_map):
-        asset_data = data.xs(
-            symbol,
-            level=1
-        ).reindex(
-            sessions.tz_localize(None)
-        ).fillna(0.0)
-        yield asset_id, asset_data
+                          symbol_map,
+                          spans=None,
+                          compact=False):
+    """Generate (sid, daily bars) pairs for every asset in symbol_map.
+    Data is sorted once by symbol and date and every asset's bars are
+    a slice of the sorted arrays placed at precomputed session positions.
+    Sessions without data are filled with zeros.
+    spans: (first, count) arrays aligned with symbol_map limiting every asset's
+    bars to its lifetime (see lifetime_spans), None: bars for all sessions
+    compact: whether data is a compact data table (see compact_data_table)
+    """
+    sessions = sessions.tz_localize(None)
+    columns, values, positions, blocks = sort_pricing_data(data, sessions, compact)
+    if spans is None:
+        spans = (np.zeros(len(symbol_map), dtype=int),
+                 np.full(len(symbol_map), len(sessions)))
+    tasks = [(blocks.get(symbol, (0, 0)), first, count)
+             for symbol, first, count in zip(symbol_map.values, *spans)]
+
+    for asset_id, (block, first, count) in zip(symbol_map.index, tasks):
+        asset_data = fill_bars(values, positions, block, count, first)
+        yield asset_id, pd.DataFrame(asset_data,
+                                     index=sessions[first:first + count],
+                                     columns=columns)
+
+
+def append_pricing_and_vol(data,
+                           sessions,
+                           symbol_map,
+                           previous_sids,
+                           previous_reader,
+                           last_session,
+                           spans=None,
+                           compact=False):
+    """Generate (sid, daily bars) pairs for every asset in symbol_map, where
+    bars up to last_session are carried forward from previous_reader
+    and bars after last_session are taken from data.
+    previous_sids: dict mapping symbols to sids of the previous ingestion
+    spans, compact: as in parse_pricing_and_vol
+    """
+    sessions = sessions.tz_localize(None)
+    carried = sessions.searchsorted(last_session, side='right')
+    columns, values, positions, blocks = sort_pricing_data(
+        data[['symbol', 'date'] + BAR_COLUMNS], sessions, compact)
+    old_bars = previous_bars(previous_reader,
+                             [previous_sids.get(symbol) for symbol in symbol_map.values],
+                             carried)
+
+    if spans is None:
+        spans = (np.zeros(len(symbol_map), dtype=int),
+                 np.full(len(symbol_map), len(sessions)))
+
+    for asset_id, symbol, first, count, old in zip(
+            symbol_map.index, symbol_map.values, *spans, old_bars):
+        asset_data = fill_bars(values, positions, blocks.get(symbol, (0, 0)),
+                               count, first)
+        if old is not None:
+            stop = min(carried, first + count)
+            if stop > first:
+                asset_data[:stop - first] = old[first:stop]
+        yield asset_id, pd.DataFrame(asset_data,
+                                     index=sessions[first:first + count],
+                                     columns=columns)
+
+
+def load_previous_ingestion(environ, output_dir, sessions, show_progress=False):
+    """Return (asset metadata, daily bar reader) of the previous ingestion of
+    the bundle if it can be carried forward, otherwise None.
+    """
+    timestr = previous_ingestion('futures', output_dir, environ)
+    if timestr is None:
+        log.info('No previous ingestion found, ingesting complete data')
+        return
+    meta = load_previous_metadata('futures', timestr, environ)
+    reader = load_previous_reader('futures', timestr, environ)
+    last_session = meta['end_date'].max()
+    if (reader.sessions[0] != sessions[0]
+            or last_session < sessions[0].tz_localize(None)):
+        log.info('Previous ingestion covers different sessions, '
+                 'ingesting complete data')
+        return
+    if last_session > reader.sessions[-1].tz_localize(None):
+        # bars of contracts' last sessions can't be carried forward
+        log.info('Previous ingestion has contracts ending {} after its last bar '
+                 'session {}, ingesting complete data'.format(
+                     last_session.date(), reader.sessions[-1].date()))
+        return
+    if show_progress:
+        log.info('Updating ingestion {}'.format(timestr))
+    return meta, reader
 
 
 @bundles.register('futures')
@@ -223,6 +659,32 @@ def futures_bundle(environ,
                    show_progress,
                    output_dir):
 
+    report = IngestReport(show_progress)
+    with report, stage('futures bundle'):
+        ingest_futures(environ,
+                       asset_db_writer,
+                       daily_bar_writer,
+                       adjustment_writer,
+                       calendar,
+                       start_session,
+                       end_session,
+                       show_progress,
+                       output_dir)
+    report.log_summary()
+    if INGEST_REPORT:
+        report.write(os.path.join(output_dir, INGEST_REPORT_FILE))
+
+
+def ingest_futures(environ,
+                   asset_db_writer,
+                   daily_bar_writer,
+                   adjustment_writer,
+                   calendar,
+                   start_session,
+                   end_session,
+                   show_progress,
+                   output_dir):
+
     api_key = environ.get('QUANDL_API_KEY')
     if api_key is None:
         raise ValueError(
@@ -230,57 +692,118 @@ def futures_bundle(environ,
         )
     quandl.ApiConfig.api_key = api_key
 
-    quandl_specs = fetch_quandl_specs_table(api_key, DOWNLOAD, show_progress)
-    # known bad data form Quandl
-    quandl_specs.drop(
-        quandl_specs[quandl_specs['code'] == 'SH1920'].index, inplace=True)
-
-    expiration = ExpirationDownloader(quandl_specs, DOWNLOAD, show_progress)
-
-    raw_data = fetch_data_table(
-        DOWNLOAD,
-        show_progress,
-        environ.get('QUANDL_DOWNLOAD_ATTEMPTS', 5),
-    )
-    asset_metadata = gen_asset_metadata(raw_data[['symbol', 'date']],
-                                        quandl_specs,
-                                        expiration,
-                                        show_progress,
-                                        META_FILE)
-
-    root_symbols = asset_metadata.root_symbol.unique()
-    root_symbols = pd.DataFrame(root_symbols, columns=['root_symbol'])
-    root_symbols['root_symbol_id'] = root_symbols.index.values
-
-    root_symbols['sector'] = [asset_metadata.loc[asset_metadata['root_symbol']
-                                                 == rs]['sector'].iloc[0] for rs in root_symbols.root_symbol.unique()]
-    root_symbols['sub_sector'] = [asset_metadata.loc[asset_metadata['root_symbol']
-                                                     == rs]['sub_sector'].iloc[0] for rs in root_symbols.root_symbol.unique()]
-    root_symbols['sector'] = root_symbols['sector'].str.cat(
-        root_symbols['sub_sector'], sep='/')
+    with stage('quandl specs') as counts:
+        quandl_specs = fetch_quandl_specs_table(api_key, DOWNLOAD, show_progress)
+        # known bad data form Quandl
+        quandl_specs.drop(
+            quandl_specs[quandl_specs['code'] == 'SH1920'].index, inplace=True)
+        counts['rows'] = len(quandl_specs)
 
-    root_symbols['exchange'] = [asset_metadata.loc[asset_metadata['root_symbol']
-                                                   == rs]['exchange'].iloc[0] for rs in root_symbols.root_symbol.unique()]
-    root_symbols['description'] = [asset_metadata.loc[asset_metadata['root_symbol']
-                                                      == rs]['name'].iloc[0] for rs in root_symbols.root_symbol.unique()]
+    with stage('expiration dates') as counts:
+        expiration = ExpirationDownloader(quandl_specs, DOWNLOAD, show_progress)
+        counts['contracts'] = len(expiration.data)
 
-    # create empty SQLite tables to prevent lookup errors in algorithms
-    divs_splits = {'divs': pd.DataFrame(columns=['sid', 'amount', 'ex_date', 'record_date',
-                                                 'declared_date', 'pay_date']),
-                   'splits': pd.DataFrame(columns=['sid', 'ratio', 'effective_date'])}
-    adjustment_writer.write(
-        splits=divs_splits['splits'], dividends=divs_splits['divs'])
-
-    asset_db_writer.write(futures=asset_metadata, root_symbols=root_symbols)
-
-    symbol_map = asset_metadata.symbol
     sessions = calendar.sessions_in_range(start_session, end_session)
-    raw_data.set_index(['date', 'symbol'], inplace=True)
-    daily_bar_writer.write(
-        parse_pricing_and_vol(
-            raw_data,
-            sessions,
-            symbol_map
-        ),
-        show_progress=show_progress
-    )
+    retries = int(environ.get('QUANDL_DOWNLOAD_ATTEMPTS', 5))
+
+    previous = None
+    if INCREMENTAL:
+        with stage('previous ingestion'):
+            previous = load_previous_ingestion(environ, output_dir, sessions,
+                                               show_progress)
+
+    with stage('quandl data') as counts:
+        if previous is None:
+            raw_data = fetch_data_table(DOWNLOAD, show_progress, retries)
+            dates = raw_data[['symbol', 'date']]
+        else:
+            previous_meta, previous_reader = previous
+            last_session = previous_meta['end_date'].max()
+            new_sessions = sessions[sessions.tz_localize(None) > last_session]
+            if len(new_sessions):
+                raw_data = fetch_new_data_table(last_session,
+                                                new_sessions[0].tz_localize(None),
+                                                DOWNLOAD, show_progress, retries)
+            else:
+                # same day rerun or end_session not after the previous ingestion
+                log.info('No sessions after {}, previous ingestion is written '
+                         'unchanged'.format(last_session.date()))
+                raw_data = empty_data_table()
+            # contracts' first and last dates are all that's needed from previous data
+            dates = pd.concat([
+                previous_meta[['symbol', 'start_date']].rename(
+                    columns={'start_date': 'date'}),
+                previous_meta[['symbol', 'end_date']].rename(
+                    columns={'end_date': 'date'}),
+                raw_data[['symbol', 'date']],
+            ], ignore_index=True)
+        counts['rows'] = len(raw_data)
+
+    with stage('asset metadata') as counts:
+        asset_metadata = gen_asset_metadata(dates,
+                                            quandl_specs,
+                                            expiration,
+                                            show_progress,
+                                            META_FILE)
+
+        root_symbols = gen_root_symbols(asset_metadata)
+        counts['contracts'] = len(asset_metadata)
+        counts['roots'] = len(root_symbols)
+
+    with stage('asset db') as counts:
+        # create empty SQLite tables to prevent lookup errors in algorithms
+        divs_splits = {'divs': pd.DataFrame(columns=['sid', 'amount', 'ex_date',
+                                                     'record_date', 'declared_date',
+                                                     'pay_date']),
+                       'splits': pd.DataFrame(columns=['sid', 'ratio',
+                                                       'effective_date'])}
+        adjustment_writer.write(
+            splits=divs_splits['splits'], dividends=divs_splits['divs'])
+
+        asset_db_writer.write(futures=asset_metadata, root_symbols=root_symbols)
+        counts['contracts'] = len(asset_metadata)
+
+    with stage('daily bars') as counts:
+        symbol_map = asset_metadata.symbol
+        spans = lifetime_spans(asset_metadata, sessions) if SPARSE_BARS else None
+        if previous is None:
+            bars = parse_pricing_and_vol(
+                raw_data,
+                sessions,
+                symbol_map,
+                spans=spans,
+                compact=COMPACT_DTYPES
+            )
+        else:
+            bars = append_pricing_and_vol(
+                raw_data,
+                sessions,
+                symbol_map,
+                dict(zip(previous_meta['symbol'], previous_meta['sid'])),
+                previous_reader,
+                last_session,
+                spans,
+                COMPACT_DTYPES
+            )
+        volumes = {}
+        if ROLL_SCHEDULE:
+            bars = collect_volumes(bars, sessions, volumes)
+        daily_bar_writer.write(count_bars(bars, counts), show_progress=show_progress)
+
+    if ROLL_SCHEDULE:
+        with stage('roll schedule') as counts:
+            schedule = roll_schedule(asset_metadata, sessions, calendar.all_sessions,
+                                     volumes, CHAIN_PREDICATES)
+            write_roll_schedule(schedule, output_dir)
+            counts['rolls'] = len(schedule)
+
+        if CONTINUOUS_SERIES:
+            with stage('continuous series') as counts:
+                # bars are read back as zipline reads them
+                reader = FutureDailyBarReader(daily_bar_writer._filename)
+                counts['roots'] = write_continuous_series(
+                    schedule, asset_metadata, reader, output_dir,
+                    CONTINUOUS_ROLL_STYLES, CONTINUOUS_OFFSETS, CONTINUOUS_ADJUSTMENTS,
+                    show_progress, CHAIN_PREDICATES)
+    elif CONTINUOUS_SERIES:
+        log.warn('Continuous series require ROLL_SCHEDULE = True, not written')
@@ -0,0 +1,89 @@
+"""
+Access to the previous ingestion of a bundle, so that an ingestion can carry
+forward what has already been ingested and add only data published since then.
+The bar writer stores prices as fixed point numbers of 1/1000 (see price_to_fixed),
+previous bars are converted back so that they are written unchanged.
+"""
+import os
+import numpy as np
+import pandas as pd
+from zipline.assets import AssetFinder
+from zipline.data.us_equity_pricing import BcolzDailyBarReader
+from zipline.data.bundles import core as bundles
+
+
+BAR_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+def price_to_fixed(prices):
+    """Convert float prices to int32 numbers of 1/1000 truncated the same way
+    as by the bar writer, missing prices are set to zero.
+    """
+    return np.nan_to_num(np.asarray(prices, dtype=np.float64) * 1000).astype(np.int32)
+
+
+def fixed_to_price(fixed):
+    """Convert int32 numbers of 1/1000 to float prices, which the bar writer
+    stores as exactly the same numbers. Prices are shifted to the middle
+    of their 1/1000 step, as the writer truncates them.
+    """
+    fixed = np.asarray(fixed, dtype=np.float64)
+    return (fixed + np.sign(fixed) * .5) / 1000
+
+
+def previous_ingestion(name, output_dir, environ=None):
+    """Return timestr of the most recent complete ingestion of the bundle
+    other than the one being written to output_dir or None if there isn't any.
+    """
+    current = os.path.basename(os.path.normpath(output_dir))
+    for timestamp in bundles.ingestions_for_bundle(name, environ=environ):
+        timestr = bundles.to_bundle_ingest_dirname(timestamp)
+        if timestr == current:
+            continue
+        # directories of failed ingestions are left empty
+        if os.path.exists(bundles.asset_db_path(name, timestr, environ=environ)):
+            return timestr
+
+
+def load_previous_metadata(name, timestr, environ=None):
+    """Return futures_contracts table of a previous ingestion with dates
+    converted to (tz naive) Timestamps.
+    """
+    finder = AssetFinder(bundles.asset_db_path(name, timestr, environ=environ))
+    meta = pd.read_sql_table('futures_contracts', finder.engine)
+    for column in ['start_date', 'end_date', 'first_traded', 'notice_date',
+                   'expiration_date', 'auto_close_date']:
+        meta[column] = pd.to_datetime(meta[column])
+    return meta
+
+
+def load_previous_reader(name, timestr, environ=None):
+    return BcolzDailyBarReader(
+        bundles.daily_equity_path(name, timestr, environ=environ))
+
+
+def previous_bars(reader, sids, sessions_count, batch=500):
+    """Generate arrays of OHLCV bars of a previous ingestion for given sids
+    and first sessions_count sessions of the reader, missing values set to zero.
+    Sids that are None generate None.
+    """
+    if not 0 < sessions_count <= len(reader.sessions):
+        raise ValueError('Previous ingestion has {} sessions, {} requested'.format(
+            len(reader.sessions), sessions_count))
+    start = reader.sessions[0]
+    end = reader.sessions[sessions_count - 1]
+    for i in range(0, len(sids), batch):
+        chunk = sids[i:i + batch]
+        known = np.array([sid for sid in chunk if sid is not None], dtype=np.int64)
+        if len(known):
+            arrays = reader.load_raw_arrays(BAR_COLUMNS, start, end, known)
+            bars = np.nan_to_num(np.dstack(arrays).astype(np.float64))
+            # prices are read as stored integers divided by 1000
+            bars[..., :4] = fixed_to_price(np.round(bars[..., :4] * 1000))
+        j = 0
+        for sid in chunk:
+            if sid is None:
+                yield None
+            else:
+                yield bars[:, j]
+                j += 1
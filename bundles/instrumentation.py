@@ -0,0 +1,157 @@
+"""
+Timing and memory usage of ingestion stages.
+
+Stages are measured with `stage` context manager while an IngestReport is active:
+
+report = IngestReport()
+with report:
+    with stage('quandl data') as counts:
+        raw_data = ...
+        counts['rows'] = len(raw_data)
+report.log_summary()
+report.write(os.path.join(output_dir, 'ingest_report.json'))
+
+Outside of an active report stages aren't recorded.
+"""
+import os
+import sys
+import json
+import time
+from datetime import datetime
+from contextlib import contextmanager
+from logbook import Logger
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+
+log = Logger(__name__)
+
+MB = 2 ** 20
+
+
+def cpu_time():
+    """CPU time in seconds used by the process and its terminated child processes.
+    """
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+def peak_rss():
+    """Return peak resident set size of the process in bytes (None if unknown).
+    """
+    if resource is not None:
+        # kilobytes on linux, bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    # peak working set is available on Windows only
+    return getattr(info, 'peak_wset', info.rss)
+
+
+class IngestReport:
+    """
+    Collects measurements of stages run while the report is active (within `with`).
+    Every stage records: name, depth (of nesting), start (ISO time),
+    wall and cpu time in seconds, peak_rss_mb at the end of the stage
+    and counts of processed items set by the stage (eg. rows, contracts).
+    Peak memory is the peak of the process so far, a stage that raised it
+    has higher peak than the previous stage.
+    """
+    active = None
+
+    def __init__(self, show_progress=False):
+        self.show_progress = show_progress
+        self.stages = []
+        self.depth = 0
+        self.created = datetime.now()
+
+    def __enter__(self):
+        IngestReport.active = self
+        return self
+
+    def __exit__(self, *exc):
+        IngestReport.active = None
+
+    def record(self, name, depth, start, wall, cpu, counts):
+        process_peak = peak_rss()
+        entry = {
+            'name': name,
+            'depth': depth,
+            'start': start.isoformat(),
+            'wall': round(wall, 3),
+            'cpu': round(cpu, 3),
+            'peak_rss_mb': None if process_peak is None else round(process_peak / MB, 1),
+        }
+        entry.update(counts)
+        self.stages.append(entry)
+        if self.show_progress:
+            log.info(self.format_stage(entry))
+
+    @staticmethod
+    def format_stage(entry):
+        line = '{}{}: {:.2f}s wall, {:.2f}s cpu'.format(
+            '  ' * entry['depth'], entry['name'], entry['wall'], entry['cpu'])
+        if entry['peak_rss_mb'] is not None:
+            line += ', peak rss {:.0f}MB'.format(entry['peak_rss_mb'])
+        for key, value in entry.items():
+            if key not in ('name', 'depth', 'start', 'wall', 'cpu', 'peak_rss_mb'):
+                line += ', {}: {}'.format(key, value)
+        return line
+
+    def log_summary(self):
+        # stages are recorded when they end, nested stages before their parents
+        ordered = sorted(self.stages, key=lambda entry: (entry['start'], entry['depth']))
+        log.info('Ingestion stages:\n' + '\n'.join(
+            self.format_stage(entry) for entry in ordered))
+
+    def to_dict(self):
+        return {'created': self.created.isoformat(),
+                'stages': self.stages}
+
+    def write(self, file):
+        try:
+            with open(file, 'w') as f:
+                json.dump(self.to_dict(), f, indent=2)
+        except OSError as e:
+            log.warn('Failed to write ingestion report {}: {}'.format(file, e))
+
+
+@contextmanager
+def stage(name):
+    """Measure the enclosed block as stage of the active IngestReport.
+    Yields dict for counts of items processed by the stage.
+    """
+    report = IngestReport.active
+    counts = {}
+    if report is None:
+        yield counts
+        return
+    depth = report.depth
+    report.depth += 1
+    start = datetime.now()
+    wall, cpu = time.perf_counter(), cpu_time()
+    try:
+        yield counts
+    finally:
+        report.depth -= 1
+        report.record(name, depth, start, time.perf_counter() - wall,
+                      cpu_time() - cpu, counts)
+
+
+def count_bars(bars, counts):
+    """Pass through (sid, bars DataFrame) pairs counting contracts and rows of bars.
+    """
+    counts.setdefault('contracts', 0)
+    counts.setdefault('rows', 0)
+    for sid, frame in bars:
+        counts['contracts'] += 1
+        counts['rows'] += len(frame)
+        yield sid, frame
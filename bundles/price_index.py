@@ -0,0 +1,146 @@
+"""
+Index of the Quandl price file by root symbol.
+
+The csv file from the zip file is decompressed once next to the zip file
+together with an index of byte ranges of rows of every root symbol,
+so that price data of selected contracts can be read without
+decompressing and parsing the whole file.
+
+Index file (json):
+The decompressed csv file takes a few times the size of the zip file on disk,
+it's replaced when the zip file changes and removed by remove_price_index
+when the index is no longer used.
+
+Index file (json):
+key: identifies zip file content (name, crc and size of the csv file)
+roots: dict mapping root symbols (Quandl format) to a list of
+[start byte, stop byte, number of rows] ranges of the csv file
+"""
+import os
+import json
+from io import BytesIO
+from zipfile import ZipFile
+from contextlib import contextmanager
+from logbook import Logger
+
+
+log = Logger(__name__)
+
+INDEX_VERSION = 1
+
+
+def index_files(zip_file):
+    """Return paths of decompressed csv file and its index for zip_file.
+    """
+    base = os.path.splitext(zip_file)[0]
+    return base + '.csv', base + '.index.json'
+
+
+def remove_price_index(zip_file):
+    """Remove decompressed csv file and index of zip_file if they exist.
+    """
+    for file in index_files(zip_file):
+        for path in (file, file + '.tmp'):
+            if os.path.exists(path):
+                log.info('Removing {}'.format(path))
+                os.remove(path)
+
+
+def zip_member(zip_file):
+    """Return ZipInfo of the only file in Quandl zip file.
+    """
+    with ZipFile(zip_file) as z:
+        infos = z.infolist()
+    assert len(infos) == 1, "Expected a single file from Quandl."
+    return infos[0]
+
+
+def zip_key(info):
+    return '{}:{}:{}:{}'.format(INDEX_VERSION, info.filename, info.CRC, info.file_size)
+
+
+def build_price_index(zip_file, show_progress=False):
+    """Decompress csv file from zip_file and index its rows by root symbol.
+    Root symbol is the contract code without month and year (eg. ES for ESZ2018).
+    Returns the index.
+    """
+    if show_progress:
+        log.info('Indexing CME data by root symbol')
+    csv_file, index_file = index_files(zip_file)
+    info = zip_member(zip_file)
+    # outdated copy isn't kept on disk alongside the new one
+    remove_price_index(zip_file)
+    roots = {}
+    offset = start = rows = 0
+    current = None
+    with ZipFile(zip_file) as z, z.open(info) as src, open(csv_file + '.tmp', 'wb') as dst:
+        for line in src:
+            dst.write(line)
+            root = line[:line.find(b',')][:-5]
+            if root != current:
+                if current is not None:
+                    roots.setdefault(current.decode(), []).append([start, offset, rows])
+                current, start, rows = root, offset, 0
+            offset += len(line)
+            rows += 1
+    if current is not None:
+        roots.setdefault(current.decode(), []).append([start, offset, rows])
+
+    index = {'key': zip_key(info), 'size': offset, 'roots': roots}
+    os.replace(csv_file + '.tmp', csv_file)
+    with open(index_file + '.tmp', 'w') as f:
+        json.dump(index, f)
+    os.replace(index_file + '.tmp', index_file)
+    return index
+
+
+def load_price_index(zip_file, show_progress=False):
+    """Return index of zip_file, which is (re)built if it's missing or outdated.
+    """
+    csv_file, index_file = index_files(zip_file)
+    try:
+        with open(index_file) as f:
+            index = json.load(f)
+        if (index['key'] == zip_key(zip_member(zip_file))
+                and os.path.getsize(csv_file) == index['size']):
+            return index
+    except (OSError, ValueError, KeyError):
+        pass
+    return build_price_index(zip_file, show_progress)
+
+
+def read_roots(zip_file, roots, show_progress=False):
+    """Return bytes of all csv rows of given root symbols in original order,
+    which are empty if there aren't any rows of those roots.
+    """
+    index = load_price_index(zip_file, show_progress)
+    ranges = sorted(r for root in roots for r in index['roots'].get(root, []))
+    if not ranges:
+        log.warn('No CME data for contracts: {}'.format(', '.join(roots)))
+        return b''
+    csv_file, _ = index_files(zip_file)
+    with open(csv_file, 'rb') as f:
+        parts = []
+        for start, stop, _ in ranges:
+            f.seek(start)
+            parts.append(f.read(stop - start))
+    if show_progress:
+        log.info('Reading {} of {} rows of CME data'.format(
+            sum(r[2] for r in ranges),
+            sum(r[2] for rs in index['roots'].values() for r in rs)))
+    return b''.join(parts)
+
+
+@contextmanager
+def open_price_file(zip_file, roots=None, show_progress=False):
+    """Open csv file with Quandl prices from zip_file as binary file.
+    If roots are given, the file contains only rows of those root symbols
+    read with the index. If there aren't any, the whole file is opened,
+    so that filtering it yields an empty table as without the index.
+    """
+    data = None if roots is None else read_roots(zip_file, roots, show_progress)
+    if data:
+        yield BytesIO(data)
+    else:
+        with ZipFile(zip_file) as z, z.open(zip_member(zip_file)) as f:
+            yield f
@@ -0,0 +1,36 @@
+import numpy as np
+from zipline.data.us_equity_pricing import BcolzDailyBarReader
+from zipline.data.bar_reader import NoDataBeforeDate, NoDataAfterDate
+
+
+class FutureDailyBarReader(BcolzDailyBarReader):
+    """
+    Daily bar reader for bundles ingested with SPARSE_BARS = True, where every
+    contract is stored only between its first and last trading day.
+    Queries outside of contract's life are answered as they would be if the contract
+    was stored for the full calendar filled with zeros: nan prices and zero volume.
+
+    Usage:
+    FutureDailyBarReader.from_reader(bundle_data.equity_daily_bar_reader)
+    """
+
+    @classmethod
+    def from_reader(cls, reader):
+        """Create reader for the same bcolz table as given BcolzDailyBarReader.
+        """
+        return cls(reader._maybe_table_rootdir)
+
+    def get_value(self, sid, dt, field):
+        try:
+            return super(FutureDailyBarReader, self).get_value(sid, dt, field)
+        except (NoDataBeforeDate, NoDataAfterDate):
+            return 0 if field == 'volume' else np.nan
+
+    def get_last_traded_dt(self, asset, day):
+        # skip directly to the last stored session
+        # rather than walking back one session at a time
+        sid = int(asset)
+        last_stored = self.sessions[self._calendar_offsets[sid]
+                                    + self._last_rows[sid] - self._first_rows[sid]]
+        return super(FutureDailyBarReader, self).get_last_traded_dt(
+            asset, min(day, last_stored))
@@ -0,0 +1,314 @@
+"""
+Roll schedule of continuous futures precomputed at ingestion.
+
+Zipline finds the active contract of a continuous future and its roll dates
+at run time: VolumeRollFinder walks back over sessions comparing volumes
+of consecutive contracts of the chain, for every query.
+The futures bundle runs the same walk once over all sessions of the bundle
+for every root symbol from bars it's writing, and stores the result in the
+bundle directory (roll_schedule.csv), one row per period when a contract
+is the primary contract of its chain:
+roll_style: 'volume' or 'calendar'
+root_symbol
+sid: primary contract
+start_date, end_date: first and last session of the period
+
+PrecomputedRollFinder answers roll finder queries from the schedule.
+Chains are built with zipline's default chain predicates (CHAIN_PREDICATES),
+which keep only some delivery months of e.g. GC, PL or currency futures;
+roots for which the asset finder uses other predicates are left to zipline.
+
+Usage (data_portal is a DataPortal for the most recent ingestion):
+install_roll_schedule(data_portal, bundles.core.most_recent_data('futures', pd.Timestamp.utcnow()))
+"""
+import os
+import numpy as np
+import pandas as pd
+from logbook import Logger
+from zipline.assets.continuous_futures import CHAIN_PREDICATES
+from zipline.assets.roll_finder import RollFinder, VolumeRollFinder
+
+
+log = Logger(__name__)
+
+ROLL_SCHEDULE_FILE = 'roll_schedule.csv'
+
+SCHEDULE_COLUMNS = ['roll_style', 'root_symbol', 'sid', 'start_date', 'end_date']
+
+
+def collect_volumes(bars, sessions, volumes):
+    """Pass through (sid, daily bars) pairs for the bar writer, storing
+    volume of every sid in volumes dict as (first session index, volumes)
+    trimmed to sessions with non-zero volume.
+    """
+    sessions = sessions.tz_localize(None)
+    for sid, frame in bars:
+        volume = frame['volume'].values.astype(np.uint32)
+        traded = np.flatnonzero(volume)
+        if len(traded):
+            first = sessions.searchsorted(frame.index[0])
+            volumes[sid] = (first + traded[0],
+                            volume[traded[0]:traded[-1] + 1].astype(np.int64))
+        yield sid, frame
+
+
+def chain_contracts(contracts, chain_predicate=None):
+    """Return contracts (asset metadata of a root symbol indexed by sid) in the
+    order of zipline's OrderedContracts: by sid, skipping leading contracts
+    that start on or after their auto close date and contracts for which
+    chain_predicate (see zipline's CHAIN_PREDICATES) is False.
+    chain_predicate is called with rows of contracts (namedtuples).
+    """
+    contracts = contracts[contracts['start_date'].notnull()].sort_index()
+    if chain_predicate is not None:
+        contracts = contracts[[bool(chain_predicate(contract))
+                               for contract in contracts.itertuples()]]
+    tradable = (contracts['start_date'] < contracts['auto_close_date']).values
+    head = np.argmax(tradable) if tradable.any() else len(contracts)
+    return contracts.iloc[head:]
+
+
+class Chain:
+    """Contracts of a root symbol in chain order (see chain_contracts)
+    with dates as int64 nanoseconds and volumes aligned with sessions.
+    """
+
+    def __init__(self, contracts, sessions, all_sessions, volumes, chain_predicate=None):
+        contracts = chain_contracts(contracts, chain_predicate)
+
+        self.sids = contracts.index.values.astype(np.int64)
+        self.start = contracts['start_date'].values.astype('datetime64[ns]').view(np.int64)
+        self.end = contracts['end_date'].values.astype('datetime64[ns]').view(np.int64)
+        self.acd = contracts['auto_close_date'].values.astype('datetime64[ns]').view(np.int64)
+        self.sessions = sessions
+        # auto close date - GRACE_DAYS sessions (as trading calendar's day offset)
+        last = all_sessions.searchsorted(self.acd, side='right') - 1
+        on_session = all_sessions[np.maximum(last, 0)] == self.acd
+        grace = last - np.where(on_session, VolumeRollFinder.GRACE_DAYS,
+                                VolumeRollFinder.GRACE_DAYS - 1)
+        self.grace_start = all_sessions[np.clip(grace, 0, len(all_sessions) - 1)]
+        self.volumes = [volumes.get(sid, (0, np.zeros(0, dtype=np.int64)))
+                        for sid in self.sids]
+
+    def __len__(self):
+        return len(self.sids)
+
+    def volume(self, c, i):
+        first, volume = self.volumes[c]
+        return volume[i - first] if first <= i < first + len(volume) else 0
+
+    def volume_active(self, f, b, j):
+        """Index of the active contract of front f and back b at session j
+        as in VolumeRollFinder._active_contract.
+        """
+        sessions = self.sessions
+        dt = sessions[j]
+        prev = sessions[j - 1] if j > 0 else dt - 1
+        if dt > min(self.acd[f], self.end[f]):
+            return b
+        elif self.start[f] > prev:
+            return b
+        elif dt > min(self.acd[b], self.end[b]):
+            return f
+        elif self.start[b] > prev:
+            return f
+
+        if self.volume(b, j - 1) > self.volume(f, j - 1):
+            return b
+
+        gap_start = max(self.start[b], self.grace_start[f])
+        if dt < gap_start:
+            return f
+        for i in range(sessions.searchsorted(gap_start), j - 1):
+            if self.volume(b, i) > self.volume(f, i):
+                return b
+        return f
+
+    def calendar_active(self, f, b, j):
+        """Index of the active contract of front f and back b at session j
+        as in CalendarRollFinder._active_contract.
+        """
+        return b if self.sessions[j] >= self.acd[f] else f
+
+    def rolls(self, active):
+        """Return list of (contract index, roll session index) as returned by
+        RollFinder.get_rolls for all sessions and offset 0.
+        """
+        sessions = self.sessions
+        last = len(sessions) - 1
+        end = sessions[last]
+
+        # primary contract at the last session
+        upcoming = self.acd > end
+        front = np.argmax(upcoming) if upcoming.any() else len(self) - 1
+        if front + 1 < len(self) and self.start[front + 1] <= end:
+            front = active(front, front + 1, last)
+        if front + 1 < len(self) and self.start[front + 1] <= end:
+            first = active(front, front + 1, last)
+        else:
+            first = front
+
+        rolls = [(first, None)]
+        curr = first - 1 if first == front else first - 2
+        i = last
+        # walk back over sessions for the session at which the chain rolls into back
+        while i > 0 and curr >= 0:
+            back = rolls[0][0]
+            while i > 0:
+                prev = i - 1
+                if curr > 0 and sessions[prev] < self.acd[curr - 1]:
+                    break
+                if back != active(curr, back, prev):
+                    rolls.insert(0, (curr, i))
+                    break
+                i = prev
+            curr -= 1
+            if curr >= 0:
+                i = min(i, sessions.searchsorted(self.acd[curr], side='right'))
+        return rolls
+
+    def schedule(self, active):
+        """Return (sids, start session index, end session index) arrays
+        of primary contracts.
+        """
+        rolls = self.rolls(active)
+        sids = self.sids[[c for c, _ in rolls]]
+        starts = np.array([0] + [i for _, i in rolls[:-1]], dtype=np.int64)
+        ends = np.r_[starts[1:] - 1, len(self.sessions) - 1]
+        return sids, starts, ends
+
+
+def roll_schedule(asset_metadata, sessions, all_sessions, volumes,
+                  chain_predicates=CHAIN_PREDICATES):
+    """Return DataFrame of the roll schedule (see module docstring) of all roots
+    of asset_metadata for the given sessions.
+    all_sessions: all sessions of the trading calendar
+    volumes: dict filled by collect_volumes
+    chain_predicates: dict mapping root symbols to chain predicates,
+    as passed to zipline's AssetFinder
+    """
+    sessions = sessions.tz_localize(None)
+    session_values = sessions.values.astype('datetime64[ns]').view(np.int64)
+    all_session_values = all_sessions.tz_localize(None).values.astype(
+        'datetime64[ns]').view(np.int64)
+    frames = []
+    for root_symbol, contracts in asset_metadata.groupby('root_symbol'):
+        chain = Chain(contracts, session_values, all_session_values, volumes,
+                      chain_predicates.get(root_symbol))
+        if not len(chain):
+            continue
+        for style, active in [('volume', chain.volume_active),
+                              ('calendar', chain.calendar_active)]:
+            sids, starts, ends = chain.schedule(active)
+            frames.append(pd.DataFrame({
+                'roll_style': style,
+                'root_symbol': root_symbol,
+                'sid': sids,
+                'start_date': sessions[starts],
+                'end_date': sessions[ends],
+            }, columns=SCHEDULE_COLUMNS))
+    if not frames:
+        return pd.DataFrame(columns=SCHEDULE_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
+
+
+def write_roll_schedule(schedule, output_dir):
+    schedule.to_csv(os.path.join(output_dir, ROLL_SCHEDULE_FILE), index=False,
+                    date_format='%Y-%m-%d')
+
+
+def load_roll_schedule(file):
+    """Return dict mapping roll style to dict mapping root symbol to
+    (start dates, end date, sids) of primary contracts,
+    dates as int64 nanoseconds (UTC).
+    """
+    df = pd.read_csv(file, parse_dates=['start_date', 'end_date'])
+    schedule = {}
+    for (style, root_symbol), rows in df.groupby(['roll_style', 'root_symbol']):
+        schedule.setdefault(style, {})[root_symbol] = (
+            rows['start_date'].values.astype('datetime64[ns]').view(np.int64),
+            rows['end_date'].values.astype('datetime64[ns]').view(np.int64)[-1],
+            rows['sid'].values.astype(np.int64))
+    return schedule
+
+
+class PrecomputedRollFinder(RollFinder):
+    """
+    Roll finder answering queries from a precomputed roll schedule of
+    one roll style. Queries about roots or dates not covered by the schedule
+    and about contracts at offsets other than 0 (zipline finds their rolls
+    comparing volumes of contracts offset apart) are passed to finder
+    (zipline's roll finder of the same style).
+
+    Primary contract is taken from the schedule computed over all sessions
+    of the bundle, so in rare cases of volumes flipping back and forth between
+    contracts it may differ from what zipline finds looking at a shorter period.
+    """
+
+    def __init__(self, finder, schedule):
+        self.finder = finder
+        self.schedule = schedule
+        self.trading_calendar = finder.trading_calendar
+        self.asset_finder = finder.asset_finder
+
+    def _active_contract(self, oc, front, back, dt):
+        return self.finder._active_contract(oc, front, back, dt)
+
+    def _covers(self, root_symbol, start, end, offset):
+        try:
+            starts, last, _ = self.schedule[root_symbol]
+        except KeyError:
+            return False
+        return not offset and starts[0] <= start.value and end.value <= last
+
+    def get_contract_center(self, root_symbol, dt, offset):
+        session = self.trading_calendar.minute_to_session_label(dt)
+        if self._covers(root_symbol, session, session, offset):
+            starts, _, sids = self.schedule[root_symbol]
+            i = np.searchsorted(starts, session.value, side='right') - 1
+            # callers take either a sid or an asset (zipline's finders differ)
+            return int(sids[i])
+        return self.finder.get_contract_center(root_symbol, dt, offset)
+
+    def get_rolls(self, root_symbol, start, end, offset):
+        if self._covers(root_symbol, start, end, offset):
+            starts, _, sids = self.schedule[root_symbol]
+            first = np.searchsorted(starts, start.value, side='right') - 1
+            last = np.searchsorted(starts, end.value, side='right') - 1
+            roll_dates = [pd.Timestamp(d, tz='UTC') for d in starts[first + 1:last + 1]]
+            return list(zip([int(sid) for sid in sids[first:last + 1]],
+                            roll_dates + [None]))
+        return self.finder.get_rolls(root_symbol, start, end, offset)
+
+
+def custom_chain_roots(asset_finder, root_symbols):
+    """Return sorted list of root_symbols whose chains asset_finder builds with
+    other predicates than CHAIN_PREDICATES, which the bundle follows.
+    """
+    predicates = getattr(asset_finder, '_future_chain_predicates', CHAIN_PREDICATES)
+    return sorted(root_symbol for root_symbol in root_symbols
+                  if predicates.get(root_symbol) is not CHAIN_PREDICATES.get(root_symbol))
+
+
+def install_roll_schedule(data_portal, bundle_dir):
+    """Replace roll finders of data_portal with PrecomputedRollFinders
+    using the roll schedule stored in bundle_dir.
+    Returns False if the bundle doesn't have a roll schedule.
+    """
+    file = os.path.join(bundle_dir, ROLL_SCHEDULE_FILE)
+    if not os.path.exists(file):
+        log.info('No roll schedule in {}, rolls are found at run time'.format(bundle_dir))
+        return False
+    schedule = load_roll_schedule(file)
+    for root_symbol in custom_chain_roots(data_portal.asset_finder,
+                                          set().union(*schedule.values())):
+        log.info('Chain of {} differs from the roll schedule, its rolls are '
+                 'found at run time'.format(root_symbol))
+        for roots in schedule.values():
+            roots.pop(root_symbol, None)
+    # the dict is shared with bar readers and history loaders of data_portal
+    finders = data_portal._roll_finders
+    for style, roots in schedule.items():
+        if style in finders:
+            finders[style] = PrecomputedRollFinder(finders[style], roots)
+    return True
@@ -16,6 +16,13 @@ because zipline's continues_future requires at least 2 character root symbols.
 # because there no data saved on disk
 DOWNLOAD = False
 
+# True: carry forward the previous ingestion of the bundle and add only
+# sessions after it and newly listed contracts (with DOWNLOAD = True only
+# the last day's data is downloaded, if that's enough to fill the gap)
+# False: ingest complete data
+# changing contracts below requires an ingestion with INCREMENTAL = False
+INCREMENTAL = False
+
 # limit time scope of ingested data
 # set to None to include all available data
 # or set dates as pd.Timestamp('2000-01-02, tz='utc')
@@ -23,6 +30,101 @@ start_session = None
 end_session = None
 
 
+# Quandl API address, data and metadata are downloaded from this host
+QUANDL_URL = 'https://www.quandl.com/api/v3'
+
+
+# number of rows of the Quandl price file parsed at a time;
+# peak memory while parsing is bound by this number rather than by file size
+# (approximate number with 'pyarrow' backend, which reads blocks of bytes)
+# set to None to parse the whole file in one go
+CHUNKSIZE = 1000000
+
+
+# parser of the Quandl price file:
+# 'pandas': single-threaded pandas parser
+# 'pyarrow': multi-threaded pyarrow parser (requires pyarrow)
+CSV_BACKEND = 'pandas'
+
+
+# True: hold parsed price data in compact dtypes (categorical symbols,
+# prices as fixed point integers at the bar writer's 1/1000 resolution,
+# integer volume and open interest), which takes several times less memory
+# and writes exactly the same bars
+COMPACT_DTYPES = False
+
+
+# True: with contracts selected below, read only their rows of the Quandl price file
+# using an index by root symbol; the index and decompressed price file
+# (CME_price_data.csv, a few times larger than the zip file, several GB for
+# complete data) are created next to the zip file on first use and whenever
+# the zip file changes
+# False: the whole zip file is parsed, decompressed file and index left by
+# a previous ingestion with True are removed
+INDEX_PRICE_FILE = False
+
+
+# True: keep parsed price data in a columnar cache (requires pyarrow),
+# which is reused as long as the Quandl zip file and contracts below don't change
+CACHE_RAW_DATA = True
+
+
+# True: write timing and memory usage of ingestion stages to ingest_report.json
+# in the bundle directory (the summary is logged regardless)
+INGEST_REPORT = True
+
+
+# True: store every contract's bars only between its first and last trading day
+# rather than for all sessions filled with zeros, which makes the bundle smaller
+# and reads faster; requires passing FutureDailyBarReader (bundles/readers.py)
+# as future_daily_reader to DataPortal (see README)
+# False: store bars for all sessions
+SPARSE_BARS = False
+
+
+# True: precompute volume and calendar roll schedules of continuous futures
+# from ingested bars and store them in the bundle directory (roll_schedule.csv),
+# so that rolls aren't found again by comparing volumes in every backtest;
+# the schedule is used by DataPortals set up with bundles/rolls.py install_roll_schedule
+# (see README)
+ROLL_SCHEDULE = True
+
+
+# True: write back-adjusted continuous series of every root symbol to the bundle
+# directory (continuous/), which history of continuous futures is read from by
+# ContinuousDataPortal (bundles/continuous.py) as plain array slices;
+# requires ROLL_SCHEDULE = True, takes sessions * roots * 8 bytes of disk space
+# per array: 10 arrays per roll style and offset, plus 4 arrays per adjustment
+CONTINUOUS_SERIES = False
+# roll styles, offsets and adjustments of the series;
+# series at offsets > 0 follow the contract at the offset from the contract
+# in the roll schedule, zipline rolls them comparing volumes of contracts
+# at the offset from each other, which may differ around rolls
+CONTINUOUS_ROLL_STYLES = ['volume']
+CONTINUOUS_OFFSETS = [0]
+CONTINUOUS_ADJUSTMENTS = ['mul', 'add']
+
+
+# downloading expiration dates from CME website (with DOWNLOAD = True):
+# number of calendars downloaded concurrently
+CME_WORKERS = 4
+# average number of requests per second and the largest burst of requests
+# sent to CME; CME temporarily blocks access after too many requests,
+# lower CME_RATE if that happens
+CME_RATE = 4
+CME_BURST = 8
+# on a block requests are paused for CME_BACKOFF seconds, doubled on every
+# consecutive block, up to CME_RETRIES times before giving up
+CME_BACKOFF = 30
+CME_RETRIES = 5
+# website address, page and file urls are requested from this host
+CME_URL = 'https://www.cmegroup.com'
+# downloaded calendars are cached on disk by root symbol and reused without
+# a request for CME_CACHE_TTL days, after that they're revalidated with CME
+# (and reused if CME can't be reached); set to None to disable the cache
+CME_CACHE_TTL = 7
+
+
 # list of symbols to ingest
 # set to empty list to ingest all available symbols
 contracts = []
@@ -1,30 +1,145 @@
 import csv
-from itertools import iteritems
+from types import MappingProxyType
 
+import numpy as np
 
-def memodict(f):
-    """ Memoization decorator for a function taking a single argument """
-    class memodict(dict):
-        def __missing__(self, key):
-            ret = self[key] = f(key)
-            return ret
-    return memodict().__getitem__
+
+class SymbolRegistry:
+    """
+    Interns symbols to dense integer ids (in order of registration)
+    with O(1) lookup in both directions.
+    Every id has a short mnemonic derived from it: the first 280 mnemonics
+    are a prefix and a suffix character (same as generated by Mapper before),
+    next ones have 2, 3... suffix characters, so there is no limit on their number.
+
+    Registry is saved as a text file with one symbol per line (line number is id).
+    """
+    PREFIXES = '$*?!<>_-'
+    SUFFIXES = 'qwertyuiopasdfghjklzxcvbnm123456789'
+    _prefix_index = {c: i for i, c in enumerate(PREFIXES)}
+    _suffix_index = {c: i for i, c in enumerate(SUFFIXES)}
+
+    def __init__(self, symbols=()):
+        self.symbols = []
+        self.ids = {}
+        for symbol in symbols:
+            self.intern(symbol)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.ids
+
+    def __iter__(self):
+        return iter(self.symbols)
+
+    def intern(self, symbol):
+        """Return id of symbol, registering it if it's new.
+        """
+        try:
+            return self.ids[symbol]
+        except KeyError:
+            id_ = self.ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+            return id_
+
+    def intern_many(self, symbols):
+        """Return array of ids of symbols, registering new ones.
+        """
+        ids = self.ids
+        return np.fromiter((ids[s] if s in ids else self.intern(s) for s in symbols),
+                           dtype=np.int64, count=len(symbols))
+
+    def id(self, symbol):
+        """Return id of registered symbol (KeyError if not registered).
+        """
+        return self.ids[symbol]
+
+    def symbol(self, id_):
+        """Return symbol with given id (IndexError if not registered).
+        """
+        if id_ < 0:
+            raise IndexError(id_)
+        return self.symbols[id_]
+
+    @classmethod
+    def mnemonic(cls, id_):
+        """Return mnemonic of id.
+        """
+        n_prefixes, n_suffixes = len(cls.PREFIXES), len(cls.SUFFIXES)
+        length = 1
+        while id_ >= n_prefixes * n_suffixes ** length:
+            id_ -= n_prefixes * n_suffixes ** length
+            length += 1
+        prefix, rest = divmod(id_, n_suffixes ** length)
+        suffix = []
+        for _ in range(length):
+            rest, i = divmod(rest, n_suffixes)
+            suffix.append(cls.SUFFIXES[i])
+        return cls.PREFIXES[prefix] + ''.join(reversed(suffix))
+
+    @classmethod
+    def mnemonic_id(cls, mnemonic):
+        """Return id of mnemonic (KeyError if it isn't a valid mnemonic).
+        """
+        n_prefixes, n_suffixes = len(cls.PREFIXES), len(cls.SUFFIXES)
+        if len(mnemonic) < 2:
+            raise KeyError(mnemonic)
+        length = len(mnemonic) - 1
+        id_ = sum(n_prefixes * n_suffixes ** i for i in range(1, length))
+        value = cls._prefix_index[mnemonic[0]]
+        for c in mnemonic[1:]:
+            value = value * n_suffixes + cls._suffix_index[c]
+        return id_ + value
+
+    def get_mnemonic(self, symbol):
+        return self.mnemonic(self.intern(symbol))
+
+    def get_symbol(self, mnemonic):
+        return self.symbol(self.mnemonic_id(mnemonic))
+
+    def save(self, filename):
+        with open(filename, 'w') as file:
+            file.write('\n'.join(self.symbols))
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as file:
+            content = file.read()
+        registry = cls()
+        registry.symbols = content.split('\n') if content else []
+        registry.ids = {s: i for i, s in enumerate(registry.symbols)}
+        return registry
 
 
 class Mapper:
-    dictionary = {}
+    """
+    Map symbols longer than 2 characters to mnemonics and back,
+    mappings are saved to csv file (symbol, mnemonic).
+    Saved mappings are kept as they are, new symbols get the mnemonics
+    (see SymbolRegistry.mnemonic) of the lowest ids not taken yet.
+    """
     filename = 'mnemonics.csv'
 
     def __init__(self, filename=None):
+        # symbol -> mnemonic and mnemonic -> symbol
+        self._mnemonics = {}
+        self._symbols = {}
+        # no mnemonic of a lower id is free
+        self._next_id = 0
         if filename:
             with open(filename) as file:
-                reader = csv.reader(file)
-                self.dictionary = dict(reader)
+                for symbol, mnemonic in csv.reader(file):
+                    self._mnemonics[symbol] = mnemonic
+                    self._symbols[mnemonic] = symbol
             self.filename = filename
 
-        self.prefixes = list('$*?!<>_-')
-        self.suffixes = list('qwertyuiopasdfghjklzxcvbnm123456789')
-        self.mnemonic = self.mnemonics_generator()
+    @property
+    def dictionary(self):
+        """Read-only mapping of symbols to mnemonics (use get_mnemonic to add).
+        """
+        return MappingProxyType(self._mnemonics)
 
     def filter(self, symbol):
         if len(symbol) > 2:
@@ -33,30 +148,25 @@ class Mapper:
             return symbol
 
     def get_mnemonic(self, symbol):
-        if symbol in self.dictionary:
-            return self.dictionary[symbol]
-        else:
-            mnemonic = next(self.mnemonic)
-            self.dictionary[symbol] = mnemonic
+        try:
+            return self._mnemonics[symbol]
+        except KeyError:
+            mnemonic = SymbolRegistry.mnemonic(self._next_id)
+            while mnemonic in self._symbols:
+                self._next_id += 1
+                mnemonic = SymbolRegistry.mnemonic(self._next_id)
+            self._mnemonics[symbol] = mnemonic
+            self._symbols[mnemonic] = symbol
             return mnemonic
 
-    def mnemonics_generator(self):
-        for prefix in self.prefixes:
-            for suffix in self.suffixes:
-                mnemonic = prefix + suffix
-                yield mnemonic
-
-    @memodict
     def get_symbol(self, mnemonic):
-        for s, m in self.dictionary.iteritems():
-            if m == mnemonic:
-                return s
+        return self._symbols.get(mnemonic)
 
     def save(self):
         try:
             with open(self.filename, 'w', newline='') as file:
                 w = csv.writer(file)
-                w.writerows(self.dictionary.items())
+                w.writerows(self._mnemonics.items())
         except PermissionError:
             print('file {} is being used by another programme'.format('mnemonics.csv'))
 
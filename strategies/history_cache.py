@@ -0,0 +1,112 @@
+"""
+History of continuous futures cached between bars.
+
+Strategies fetch a window of the last bar_count daily bars of all contracts
+on every bar, while only one bar is new. HistoryCache keeps the window in
+ring buffers and fetches only the new bar. Whole window of a continuous future
+is fetched again when it enters the universe or when its contract has changed
+since the previous bar, since history as seen after a roll is adjusted for it.
+"""
+import numpy as np
+import pandas as pd
+
+
+class HistoryCache:
+    """
+    data.history(assets, fields, bar_count, '1d') kept in ring buffers.
+
+    Every bar is written to the buffer twice (at slots i and i + bar_count),
+    so the window is always a contiguous slice of the buffer and DataFrames
+    returned for fields are views of it, valid until the next update.
+    Has to be updated on every session (as handle_data with daily bars is).
+
+    Usage:
+    context.history = HistoryCache(['price', 'high', 'low'], bar_count)
+    hist = context.history.update(data, assets)
+    hist['price']: DataFrame with index: dates, columns: assets
+    """
+
+    def __init__(self, fields, bar_count):
+        self.fields = list(fields)
+        self.bar_count = bar_count
+        self.assets = pd.Index([])
+        # current contracts of assets (Series)
+        self.contracts = pd.Series([], dtype=object)
+        self.buffer = np.full((len(self.fields), 2 * bar_count, 0), np.nan)
+        # slot of the oldest bar
+        self.pos = 0
+        # dates of the window
+        self.index = None
+
+    def __getitem__(self, field):
+        return pd.DataFrame(
+            self.buffer[self.fields.index(field), self.pos:self.pos + self.bar_count],
+            index=self.index, columns=self.assets)
+
+    def update(self, data, assets):
+        """Update the window to end at the current bar for assets
+        (list of continuous futures), returns self.
+        """
+        assets = pd.Index(assets)
+        contracts = data.current(list(assets), 'contract')
+        if self.index is None:
+            self._reset(data, assets)
+        else:
+            self._advance(data, assets, contracts)
+        self.contracts = contracts
+        return self
+
+    def _reset(self, data, assets):
+        self.assets = assets
+        self.buffer = np.full((len(self.fields), 2 * self.bar_count, len(assets)), np.nan)
+        self.pos = 0
+        window = data.history(list(assets), self.fields, self.bar_count, '1d')
+        self.index = window[self.fields[0]].index
+        self._write(np.arange(len(assets)), window)
+
+    def _write(self, columns, window):
+        """Write window of bar_count bars of columns to the buffer.
+        """
+        slots = (self.pos + np.arange(self.bar_count)) % self.bar_count
+        for i, field in enumerate(self.fields):
+            values = window[field].values
+            self.buffer[i][np.ix_(slots, columns)] = values
+            self.buffer[i][np.ix_(slots + self.bar_count, columns)] = values
+
+    def _advance(self, data, assets, contracts):
+        positions = self.assets.get_indexer(assets)
+        previous = np.asarray(self.contracts, dtype=object)
+        if len(positions) != len(self.assets) or (positions != np.arange(len(positions))).any():
+            # universe has changed, new assets are fetched below
+            old = positions >= 0
+            buffer = np.full(self.buffer.shape[:2] + (len(assets),), np.nan)
+            buffer[:, :, old] = self.buffer[:, :, positions[old]]
+            self.buffer = buffer
+            previous = np.array([previous[i] if i >= 0 else None for i in positions],
+                                dtype=object)
+            self.assets = assets
+
+        last = data.history(list(assets), self.fields, 1, '1d')
+        session = last[self.fields[0]].index
+        if session[-1] == self.index[-1]:
+            # same session again, last bar is replaced
+            slot = (self.pos - 1) % self.bar_count
+        else:
+            slot = self.pos
+            self.pos = (self.pos + 1) % self.bar_count
+            self.index = self.index[1:].append(session[-1:])
+        for i, field in enumerate(self.fields):
+            values = last[field].values[-1]
+            self.buffer[i, slot] = values
+            self.buffer[i, slot + self.bar_count] = values
+
+        update = positions >= 0
+        update[update] = previous[update] == np.asarray(contracts, dtype=object)[update]
+        refetch = np.flatnonzero(~update)
+        if len(refetch):
+            window = data.history(list(assets[refetch]), self.fields, self.bar_count, '1d')
+            if not window[self.fields[0]].index.equals(self.index):
+                # sessions were skipped, start over
+                self._reset(data, assets)
+            else:
+                self._write(refetch, window)
@@ -0,0 +1,380 @@
+"""
+Indicators of strategies computed for all contracts at once.
+
+ema, atr, channel and log_returns take history of all contracts as 2-D arrays
+(bars, contracts) and compute the indicator of every contract in one
+vectorized pass, with nans handled as by the talib/pandas calls they replace.
+
+Indicators can also be updated incrementally bar by bar.
+Strategies compute talib.EMA and talib.ATR over a history window of the last
+`window` bars on every bar. Since the window moves by one bar at a time,
+the same values can be kept up to date in O(1) per contract and bar:
+talib seeds an EMA with SMA of the first `period` values of the window,
+so its state is the sum of the seed values and the exponentially weighted sum
+of the rest of the window. When the window moves, one value leaves the seed,
+one value passes from the weighted part to the seed and one new value enters.
+Max and min of the breakout channel are kept in monotonic deques.
+
+State is seeded from a history window for contracts entering the universe
+and re-seeded when a continuous future rolls (history of a continuous future
+as seen after the roll is adjusted for it).
+"""
+import warnings
+from collections import deque
+import numpy as np
+import pandas as pd
+
+
+def _take(array, positions, fill):
+    """Return columns (last axis) of array at positions, -1 for new columns
+    filled with fill.
+    """
+    out = np.full(array.shape[:-1] + (len(positions),), fill, dtype=array.dtype)
+    old = positions >= 0
+    out[..., old] = array[..., positions[old]]
+    return out
+
+
+def _fill(price, high, low):
+    """Replace missing high and low with price.
+    """
+    return (price, np.where(np.isnan(high), price, high),
+            np.where(np.isnan(low), price, low))
+
+
+def true_range(high, low, close):
+    """talib.TRANGE of arrays along the first axis, without the first bar.
+    """
+    previous = close[:-1]
+    return np.maximum(np.maximum(high[1:] - low[1:], np.abs(high[1:] - previous)),
+                      np.abs(low[1:] - previous))
+
+
+def _ema_state(values, period, k):
+    """Return state of WindowedEMA (seed_sum, tail, length, blocked)
+    for windows in columns of values.
+    """
+    bars, columns = values.shape
+    missing = np.isnan(values)
+    rows = np.arange(bars)[:, None]
+    last_nan = np.where(missing, rows, -1).max(axis=0)
+    first_valid = np.where(missing, bars, rows).min(axis=0)
+    start = last_nan + 1
+    end = np.minimum(start + period, bars)
+    x = np.where(missing, 0.0, values)
+    index = np.arange(columns)
+    sums = np.vstack([np.zeros(columns), np.cumsum(x, axis=0)])
+    seed_sum = sums[end, index] - sums[start, index]
+    # weights of values in the tail relative to the last bar
+    weights = k * (1 - k) ** np.arange(bars - 1, -1, -1)
+    weighted = np.vstack([np.cumsum((weights[:, None] * x)[::-1], axis=0)[::-1],
+                          np.zeros(columns)])
+    tail = weighted[end, index]
+    # nan at index i of the window leaves it after i bars
+    blocked = np.where(first_valid < last_nan, last_nan, 0)
+    return seed_sum, tail, bars - start, blocked
+
+
+def _ema_value(seed_sum, tail, length, blocked, period, k):
+    ready = (length >= period) & (blocked == 0)
+    with np.errstate(invalid='ignore'):
+        value = (1 - k) ** (length - period) * seed_sum / period + tail
+    return np.where(ready, value, np.nan)
+
+
+def ema(values, period):
+    """talib.EMA(values[:, j], period)[-1] for every column j of values.
+    """
+    k = 2 / (period + 1)
+    return _ema_value(*_ema_state(values, period, k), period, k)
+
+
+def atr(high, low, close, period):
+    """talib.ATR(high[:, j], low[:, j], close[:, j], period)[-1] for every
+    column j, missing high and low replaced with close.
+    Nans of close are expected to be leading only (as in forward filled price).
+    """
+    close, high, low = _fill(close, high, low)
+    k = 1 / period
+    return _ema_value(*_ema_state(true_range(high, low, close), period, k), period, k)
+
+
+def channel(values, length, lag=0):
+    """Return (max, min) of every column over `length` bars ending `lag` bars
+    before the last one, skipping nans as DataFrame.max/min do.
+    """
+    window = values[max(len(values) - length - lag, 0):len(values) - lag]
+    with warnings.catch_warnings():
+        # all-nan columns give nan
+        warnings.simplefilter('ignore', RuntimeWarning)
+        return np.nanmax(window, axis=0), np.nanmin(window, axis=0)
+
+
+def log_returns(values):
+    """Log returns of every column, nan for the first bar,
+    same as np.log(DataFrame.pct_change() + 1): missing values are forward filled.
+    """
+    rows = np.arange(len(values))[:, None]
+    filled = values[np.maximum.accumulate(np.where(np.isnan(values), 0, rows), axis=0),
+                    np.arange(values.shape[1])]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.vstack([np.full((1, values.shape[1]), np.nan),
+                          np.log(filled[1:] / filled[:-1])])
+
+
+class WindowedEMA:
+    """
+    Last value of talib.EMA(values[-window:], period) for every column
+    of a series of values. Smoothing factor k is 2 / (period + 1) for EMA,
+    1 / period gives Wilder's smoothing used by talib.ATR.
+
+    As talib does, leading nans of the window are skipped and a nan following
+    valid values makes the result nan until it leaves the window.
+    """
+
+    def __init__(self, window, period, k):
+        self.window = window
+        self.period = period
+        self.k = k
+        self.buffer = np.full((window, 0), np.nan)
+        # slot of the oldest value in buffer
+        self.pos = 0
+        # sum of the seed values and weighted sum of the rest of the window
+        self.seed_sum = np.zeros(0)
+        self.tail = np.zeros(0)
+        # number of values since the last nan
+        self.length = np.zeros(0, dtype=np.int64)
+        # bars until the last nan following valid values leaves the window
+        self.blocked = np.zeros(0, dtype=np.int64)
+
+    def take(self, positions):
+        """Keep columns at positions, -1 for new (empty) columns.
+        """
+        self.buffer = _take(self.buffer, positions, np.nan)
+        self.seed_sum = _take(self.seed_sum, positions, 0.0)
+        self.tail = _take(self.tail, positions, 0.0)
+        self.length = _take(self.length, positions, 0)
+        self.blocked = _take(self.blocked, positions, 0)
+
+    def seed(self, columns, values):
+        """Set state of columns from values, array (bars, len(columns))
+        of the last bars.
+        """
+        window = self.window
+        values = values[-window:]
+        values = np.vstack([np.full((window - len(values), len(columns)), np.nan), values])
+        slots = (self.pos + np.arange(window)) % window
+        self.buffer[np.ix_(slots, columns)] = values
+        (self.seed_sum[columns], self.tail[columns], self.length[columns],
+         self.blocked[columns]) = _ema_state(values, self.period, self.k)
+
+    def update(self, values):
+        """Move the window of all columns by one bar with new values.
+        """
+        window, period, k = self.window, self.period, self.k
+        missing = np.isnan(values)
+        length = self.length
+        full = (length == window) & ~missing
+        leaving = self.buffer[self.pos]
+        if period < window:
+            crossing = self.buffer[(self.pos + period) % window]
+        else:
+            crossing = values
+        self.seed_sum = np.where(~missing & (length < period),
+                                 self.seed_sum + values, self.seed_sum)
+        self.seed_sum = np.where(full, self.seed_sum + crossing - leaving, self.seed_sum)
+        self.tail = np.where(~missing & (length >= period),
+                             (1 - k) * self.tail + k * values, self.tail)
+        self.tail = np.where(full, self.tail - k * (1 - k) ** (window - period) * crossing,
+                             self.tail)
+
+        # values after a nan are a new series
+        self.blocked = np.where(missing & (length > 0), window - 1,
+                                np.maximum(self.blocked - 1, 0))
+        self.seed_sum[missing] = 0
+        self.tail[missing] = 0
+        self.length = np.where(missing, 0, np.minimum(length + 1, window))
+        self.buffer[self.pos] = values
+        self.pos = (self.pos + 1) % window
+
+    @property
+    def value(self):
+        return _ema_value(self.seed_sum, self.tail, self.length, self.blocked,
+                         self.period, self.k)
+
+
+class WindowedATR:
+    """
+    Last value of talib.ATR(high[-window:], low[-window:], close[-window:], period)
+    for every column.
+    """
+
+    def __init__(self, window, period):
+        # true range isn't defined for the first bar of the window
+        self.average = WindowedEMA(window - 1, period, 1 / period)
+        self.close = np.zeros(0)
+
+    def take(self, positions):
+        self.average.take(positions)
+        self.close = _take(self.close, positions, np.nan)
+
+    def seed(self, columns, high, low, close):
+        self.average.seed(columns, true_range(high, low, close))
+        self.close[columns] = close[-1]
+
+    def update(self, high, low, close):
+        self.average.update(true_range(np.stack([self.close, high]),
+                                       np.stack([self.close, low]),
+                                       np.stack([self.close, close]))[0])
+        self.close = np.array(close)
+
+    @property
+    def value(self):
+        return self.average.value
+
+
+class RollingChannel:
+    """
+    channel(values, length, lag) for every column maintained bar by bar
+    with monotonic deques of (bar, value): amortized O(1) per column and bar.
+    """
+
+    def __init__(self, length, lag):
+        self.length = length
+        self.lag = lag
+        # number of the last bar
+        self.bar = 0
+        self.highs = []
+        self.lows = []
+
+    def take(self, positions):
+        self.highs = [self.highs[i] if i >= 0 else deque() for i in positions]
+        self.lows = [self.lows[i] if i >= 0 else deque() for i in positions]
+
+    def _push(self, column, bar, value):
+        if value != value:
+            # nans are skipped
+            return
+        highs, lows = self.highs[column], self.lows[column]
+        while highs and highs[-1][1] <= value:
+            highs.pop()
+        highs.append((bar, value))
+        while lows and lows[-1][1] >= value:
+            lows.pop()
+        lows.append((bar, value))
+
+    def seed(self, columns, values):
+        """Set state of columns from values, array (bars, len(columns))
+        of the last bars.
+        """
+        rows = len(values)
+        start = max(rows - self.length - self.lag, 0)
+        for i, column in enumerate(columns):
+            self.highs[column] = deque()
+            self.lows[column] = deque()
+            for row in range(start, rows - self.lag):
+                self._push(column, self.bar - (rows - 1 - row), values[row, i])
+
+    def update(self, values):
+        """Move the window of all columns by one bar, values is the array of
+        bars (at least lag + 1) ending at the new bar.
+        """
+        self.bar += 1
+        entering = self.bar - self.lag
+        expired = entering - self.length
+        for column, value in enumerate(values[-1 - self.lag]):
+            self._push(column, entering, value)
+            for queue in (self.highs[column], self.lows[column]):
+                while queue and queue[0][0] <= expired:
+                    queue.popleft()
+
+    @property
+    def value(self):
+        """(max, min) arrays.
+        """
+        return (np.array([q[0][1] if q else np.nan for q in self.highs]),
+                np.array([q[0][1] if q else np.nan for q in self.lows]))
+
+
+class Indicators:
+    """
+    EMAs of price and ATR over the window of the last `window` bars of contracts
+    in the universe, same as:
+    talib.EMA(price, period)[-1] for period in ema_periods
+    talib.ATR(high.fillna(price), low.fillna(price), price, atr_period)[-1]
+    and breakout channel of price (channel=(length, lag), see channel function).
+
+    Usage (on every bar):
+    indicators.update(price, high, low, contracts)
+    indicators.ema(period), indicators.atr(), indicators.channel()
+    """
+
+    def __init__(self, window, ema_periods, atr_period, channel=None):
+        self.window = window
+        self.emas = {period: WindowedEMA(window, period, 2 / (period + 1))
+                     for period in ema_periods}
+        self.average_true_range = WindowedATR(window, atr_period)
+        self.rolling_channel = RollingChannel(*channel) if channel else None
+        self.columns = pd.Index([])
+        self.contracts = np.empty(0, dtype=object)
+        self.session = None
+
+    def update(self, price, high, low, contracts):
+        """Update state with DataFrames of history (bars, continuous futures)
+        ending at the current bar.
+        contracts: current contracts of continuous futures (Series); continuous
+        futures entering the universe or whose contract has changed since
+        the previous bar are (re-)seeded from the history window.
+        """
+        positions = self.columns.get_indexer(price.columns)
+        if self.session is None or price.index[-2] != self.session:
+            # bars were skipped, start over
+            positions[:] = -1
+        self.columns = price.columns
+        previous = self.contracts
+        if len(positions) != len(previous) or (positions != np.arange(len(positions))).any():
+            # universe has changed
+            for indicator in self._indicators():
+                indicator.take(positions)
+            previous = _take(previous, positions, None)
+        contracts = np.asarray(contracts.reindex(price.columns), dtype=object)
+        self.contracts = contracts
+
+        update = positions >= 0
+        update[update] = previous[update] == contracts[update]
+        seed = np.flatnonzero(~update)
+        self.session = price.index[-1]
+        price, high, low = price.values, high.values, low.values
+
+        # only the last bar and windows of seeded columns are read
+        p, h, l = _fill(price[-1], high[-1], low[-1])
+        for average in self.emas.values():
+            average.update(p)
+        self.average_true_range.update(h, l, p)
+        if self.rolling_channel is not None:
+            self.rolling_channel.update(price)
+        if len(seed):
+            p, h, l = _fill(price[:, seed], high[:, seed], low[:, seed])
+            for average in self.emas.values():
+                average.seed(seed, p)
+            self.average_true_range.seed(seed, h, l, p)
+            if self.rolling_channel is not None:
+                self.rolling_channel.seed(seed, p)
+
+    def _indicators(self):
+        indicators = list(self.emas.values()) + [self.average_true_range]
+        if self.rolling_channel is not None:
+            indicators.append(self.rolling_channel)
+        return indicators
+
+    def ema(self, period):
+        return pd.Series(self.emas[period].value, index=self.columns)
+
+    def atr(self):
+        return pd.Series(self.average_true_range.value, index=self.columns)
+
+    def channel(self):
+        """(max, min) Series.
+        """
+        return tuple(pd.Series(value, index=self.columns)
+                     for value in self.rolling_channel.value)
@@ -2,7 +2,6 @@
 
 import pandas as pd
 import numpy as np
-import talib
 import sys
 from datetime import datetime
 from logbook import Logger, StreamHandler, FileHandler
@@ -13,6 +12,7 @@ from zipline.api import (order, record, symbol, continuous_future,
 from zipline.finance.slippage import FixedSlippage, SlippageModel
 from zipline.finance.commission import PerTrade
 from contracts import contracts
+from indicators import ema, atr as average_true_range, channel
 import pdb
 
 
@@ -66,22 +66,16 @@ def handle_data(context, data):
                         bar_count=SLOW_MA + 1,
                         frequency='1d')
 
-    slow_ma = hist['price'].apply(lambda x:
-                                  talib.EMA(x.as_matrix(),
-                                            timeperiod=SLOW_MA)[-1])
-    fast_ma = hist['price'].apply(lambda x:
-                                  talib.EMA(x.as_matrix(),
-                                            timeperiod=FAST_MA)[-1])
-    atr = hist.apply(lambda x: talib.ATR(x['high'].fillna(x['price']).as_matrix(),
-                                         x['low'].fillna(
-                                             x['price']).as_matrix(),
-                                         x['price'].as_matrix(),
-                                         timeperiod=SLOW_MA)[-1],
-                     axis=(1, 0))
-    # breakout above is a buy signal
-    upper = hist['price'][-BREAKOUT-1:-2].max(axis=0)
-    # breakout below is a sell signal
-    lower = hist['price'][-BREAKOUT-1:-2].min(axis=0)
+    # indicators of all contracts at once, same as talib.EMA and talib.ATR
+    prices = hist['price']
+    slow_ma = pd.Series(ema(prices.values, SLOW_MA), index=prices.columns)
+    fast_ma = pd.Series(ema(prices.values, FAST_MA), index=prices.columns)
+    atr = pd.Series(average_true_range(hist['high'].values, hist['low'].values,
+                                       prices.values, SLOW_MA),
+                    index=prices.columns)
+    # breakout above is a buy signal, breakout below is a sell signal
+    upper, lower = (pd.Series(x, index=prices.columns) for x in
+                    channel(prices.values, BREAKOUT - 1, lag=2))
     # last price
     price = hist['price'].fillna(method='ffill').iloc[-1]
 
@@ -2,7 +2,6 @@
 
 import pandas as pd
 import numpy as np
-import talib
 from zipline.api import (order, record, symbol, continuous_future,
                          future_symbol, get_open_orders, order_target_percent,
                          set_slippage, set_commission, get_datetime,
@@ -10,6 +9,7 @@ from zipline.api import (order, record, symbol, continuous_future,
 from zipline.finance.slippage import FixedSlippage, SlippageModel
 from zipline.finance.commission import PerTrade
 from contracts import contracts
+from indicators import ema, atr, channel
 import scipy.linalg as lg
 import pdb
 
@@ -55,16 +55,13 @@ def handle_data(context, data):
                         bar_count=SLOW_MA + 1,
                         frequency='1d')
 
-    context.slow_ma = hist['price'].apply(lambda x: talib.EMA(
-        x.values, timeperiod=SLOW_MA)[-1])
-    context.fast_ma = hist['price'].apply(lambda x: talib.EMA(
-        x.values, timeperiod=FAST_MA)[-1])
-    context.atr = hist.apply(lambda x: talib.ATR(
-        x['high'].fillna(x['price']).values,
-        x['low'].fillna(x['price']).values,
-        x['price'].values,
-        timeperiod=SLOW_MA)[-1],
-        axis=(1, 0)).fillna(method='ffill')
+    # indicators of all contracts at once, same as talib.EMA and talib.ATR
+    prices = hist['price']
+    context.slow_ma = pd.Series(ema(prices.values, SLOW_MA), index=prices.columns)
+    context.fast_ma = pd.Series(ema(prices.values, FAST_MA), index=prices.columns)
+    context.atr = pd.Series(atr(hist['high'].values, hist['low'].values,
+                                prices.values, SLOW_MA),
+                            index=prices.columns).fillna(method='ffill')
 
     # std = hist.pct_change().std()
 
@@ -106,10 +103,9 @@ def get_entries(context):
     returns:
     Series with index: continuous_future, columns: 1 or -1 for long or short signal
     """
-    # breakout above is a buy signal
-    upper = context.prices[-BREAKOUT-1:-2].max(axis=0)
-    # breakout below is a sell signal
-    lower = context.prices[-BREAKOUT-1:-2].min(axis=0)
+    # breakout above is a buy signal, breakout below is a sell signal
+    upper, lower = (pd.Series(x, index=context.prices.columns) for x in
+                    channel(context.prices.values, BREAKOUT - 1, lag=2))
 
     longs = ((context.last_price > upper) & (
         context.fast_ma > context.slow_ma)) * 1
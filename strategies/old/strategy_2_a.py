@@ -57,7 +57,7 @@ def optimize_portfolio(context, target_positions):
 
 
 def get_correlations_1(context):
-    returns = np.log(context.prices.pct_change()+1)[1:]
+    returns = context.returns[1:]
     corr = returns.corr()
     count = corr.apply(lambda x: x[x < 0.2].count())
     buckets = pd.cut(count, 3, labels=[0.5, 1, 1.5],).sort_values()
@@ -65,7 +65,7 @@ def get_correlations_1(context):
 
 
 def get_correlations_2(context):
-    returns = np.log(context.prices.pct_change()+1)[1:]
+    returns = context.returns[1:]
     corrs = {}
     for symbol in returns.columns:
         corrs[symbol] = returns[symbol].corr(
@@ -65,7 +65,7 @@ def optimize_portfolio(context, target_positions):
 
 
 def get_vol(context, target_positions):
-    returns = np.log(context.prices.pct_change()+1)[-VOL_DAYS:]
+    returns = context.returns[-VOL_DAYS:]
     target_positions = target_positions.copy()
     target_positions.index = target_positions.index.map(
         lambda x: x.root_symbol)
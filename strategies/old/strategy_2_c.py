@@ -76,7 +76,7 @@ def get_correlations(context, target_positions):
 
 
 def get_vol(context, target_positions):
-    returns = np.log(context.prices.pct_change()+1)[-VOL_DAYS:]
+    returns = context.returns[-VOL_DAYS:]
     target_positions = target_positions.copy()
     target_positions.index = target_positions.index.map(
         lambda x: x.root_symbol)
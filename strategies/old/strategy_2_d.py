@@ -73,7 +73,7 @@ def optimize_portfolio(context, target_positions):
 
 
 def get_correlations(context):
-    returns = np.log(context.prices.pct_change()+1)[1:]
+    returns = context.returns[1:]
     corr = returns.corr()
     count = corr.apply(lambda x: x[x < 0.2].count())
     buckets = pd.cut(count, 3, labels=[0.5, 1, 1.5],).sort_values()
@@ -81,7 +81,7 @@ def get_correlations(context):
 
 
 def get_vol(context, target_positions):
-    returns = np.log(context.prices.pct_change()+1)[-VOL_DAYS:]
+    returns = context.returns[-VOL_DAYS:]
     target_positions = target_positions.copy()
     target_positions.index = target_positions.index.map(
         lambda x: x.root_symbol)
@@ -1,7 +1,6 @@
 import pickle
 import pandas as pd
 import numpy as np
-import talib
 from collections import OrderedDict
 from zipline.api import (continuous_future, get_open_orders,
                          order_target_percent, set_slippage,
@@ -11,6 +10,9 @@ from zipline.finance.slippage import SlippageModel
 from zipline.finance.commission import PerTrade
 from zipline import run_algorithm
 from contracts import contracts
+from indicators import Indicators, log_returns
+from history_cache import HistoryCache
+from universe import Universe
 
 
 FAST_MA = 50  # 50
@@ -52,7 +54,14 @@ def initialize(context):
                           adjustment='mul',
                           roll='volume')
         for contract in contracts]
+    # contracts with at least SLOW_MA+2 days of history that haven't ended
+    context.universe = Universe(context.contracts, pd.Timedelta(days=SLOW_MA+2))
     context.min_max = {}
+    # history window updated with one new bar a day
+    context.history = HistoryCache(['price', 'high', 'low'], SLOW_MA + 1)
+    # EMAs, ATR and breakout channel of the history window updated bar by bar
+    context.indicators = Indicators(SLOW_MA + 1, [SLOW_MA, FAST_MA], SLOW_MA,
+                                    channel=(BREAKOUT - 1, 2))
     # auxiliary variables selectively used in various portfolio optimization methods
     context.counter = 0
     context.target_portfolio = pd.Series()
@@ -75,44 +84,41 @@ def handle_data(context, data):
 
 
 def get_data(context, data):
-    valid_contracts = [contract for contract in context.contracts
-                       if contract.start_date <= get_datetime() - pd.Timedelta(days=SLOW_MA+2)
-                       and contract.end_date >= get_datetime()]
-
-    hist = data.history(valid_contracts,
-                        fields=['price', 'high', 'low'],
-                        bar_count=SLOW_MA + 1,
-                        frequency='1d')
-
-    context.slow_ma = hist['price'].apply(lambda x: talib.EMA(
-        x.values, timeperiod=SLOW_MA)[-1])
-    context.fast_ma = hist['price'].apply(lambda x: talib.EMA(
-        x.values, timeperiod=FAST_MA)[-1])
-    context.atr = hist.apply(lambda x: talib.ATR(
-        x['high'].fillna(x['price']).values,
-        x['low'].fillna(x['price']).values,
-        x['price'].values,
-        timeperiod=SLOW_MA)[-1],
-        axis=(1, 0)).fillna(method='ffill')
+    valid_contracts = context.universe.update(get_datetime())
 
-    # std = hist.pct_change().std()
-
-    # make variables available globally
-    context.prices = hist['price']
-    context.last_price = context.prices.fillna(method='ffill').iloc[-1]
+    # same as data.history(valid_contracts, fields=['price', 'high', 'low'],
+    # bar_count=SLOW_MA + 1, frequency='1d')
+    hist = context.history.update(data, valid_contracts)
 
     # Series for translations from ContinuousFuture to current Future objects
-    context.translate = data.current(
-        context.prices.columns, 'contract')
+    context.translate = context.history.contracts
     # Series for translations from root_symbol to current Future objects
     context.translate_root = pd.Series({contract.root_symbol: contract
                                         for contract in context.translate.values})
 
+    # same as talib.EMA and talib.ATR over hist, re-seeded on rolls
+    context.indicators.update(hist['price'], hist['high'], hist['low'],
+                              context.translate)
+    context.slow_ma = context.indicators.ema(SLOW_MA)
+    context.fast_ma = context.indicators.ema(FAST_MA)
+    context.atr = context.indicators.atr().fillna(method='ffill')
+    # max/min of prices[-BREAKOUT-1:-2]
+    context.upper, context.lower = context.indicators.channel()
+
+    # std = hist.pct_change().std()
+
+    # make variables available globally
+    context.prices = hist['price']
+    context.last_price = context.prices.fillna(method='ffill').iloc[-1]
+
     # reindex to use root_symbol instead of ContinuousFuture
     reindex(context.atr, context.last_price, context.slow_ma,
-            context.fast_ma)
+            context.fast_ma, context.upper, context.lower)
     context.prices.columns = context.prices.columns.map(
         lambda x: x.root_symbol)
+    context.returns = pd.DataFrame(log_returns(context.prices.values),
+                                   index=context.prices.index,
+                                   columns=context.prices.columns)
 
 
 def get_entries(context):
@@ -124,13 +130,10 @@ def get_entries(context):
     Series with index: continuous_future, columns: 1 or -1 for long or short signal
     """
     # breakout above is a buy signal
-    upper = context.prices[-BREAKOUT-1:-2].max(axis=0)
     # breakout below is a sell signal
-    lower = context.prices[-BREAKOUT-1:-2].min(axis=0)
-
-    longs = ((context.last_price > upper) & (
+    longs = ((context.last_price > context.upper) & (
         context.fast_ma > context.slow_ma)) * 1
-    shorts = ((context.last_price < lower) & (
+    shorts = ((context.last_price < context.lower) & (
         context.fast_ma < context.slow_ma)) * -1
     signals = longs + shorts
     signals = signals[signals != 0].dropna()
@@ -294,7 +297,7 @@ def get_vol(context, target_positions):
     Calculate realized portfolio volatility. Return adjustment factor to get from 
     realised to target vol.
     """
-    returns = np.log(context.prices.pct_change()+1)[-VOL_DAYS:]
+    returns = context.returns[-VOL_DAYS:]
     target_positions = target_positions.copy()
     target_positions.index = target_positions.index.map(
         lambda x: x.root_symbol)
@@ -334,7 +337,7 @@ def get_correlations_1(context):
     Pairwise correlation of all assets. Rank by number of correlations lower than .2. 
     Split into three buckets.
     """
-    returns = np.log(context.prices.pct_change()+1)[1:]
+    returns = context.returns[1:]
     corr = returns.corr()
     count = corr.apply(lambda x: x[x < 0.2].count())
     buckets = pd.cut(count, 3, labels=[0.5, 1, 1.5],).sort_values()
@@ -346,7 +349,7 @@ def get_correlations_2(context):
     Correlation of every asset vs. equally weighted portfolio of all other assets.
     Rank results and split assets into three buckets.
     """
-    returns = np.log(context.prices.pct_change()+1)[1:]
+    returns = context.returns[1:]
     corrs = {}
     for symbol in returns.columns:
         corrs[symbol] = returns[symbol].corr(
@@ -0,0 +1,66 @@
+"""
+Universe of contracts valid for trading at a given time.
+
+A contract is valid from `lead` after its start date until its end date.
+Activation and deactivation times of all contracts are sorted once,
+then each bar only applies the events since the previous bar.
+"""
+import numpy as np
+
+
+class Universe:
+    """
+    Contracts (e.g. ContinuousFuture) valid at dt, same as:
+    [c for c in contracts if c.start_date <= dt - lead and c.end_date >= dt]
+
+    Usage:
+    context.universe = Universe(context.contracts, pd.Timedelta(days=SLOW_MA+2))
+    valid_contracts = context.universe.update(get_datetime())
+    """
+
+    def __init__(self, contracts, lead):
+        self.contracts = list(contracts)
+        # int64 nanoseconds
+        self.starts = np.array([(c.start_date + lead).value for c in self.contracts],
+                               dtype=np.int64)
+        self.ends = np.array([c.end_date.value for c in self.contracts], dtype=np.int64)
+        self.activations = np.argsort(self.starts, kind='mergesort')
+        self.deactivations = np.argsort(self.ends, kind='mergesort')
+        self.reset()
+
+    def reset(self):
+        # next activation and deactivation to apply
+        self.next_activation = 0
+        self.next_deactivation = 0
+        self.active = set()
+        self.valid = []
+        self.dt = None
+
+    def update(self, dt):
+        """Return list of contracts valid at dt (in the order of contracts).
+        """
+        t = dt.value
+        if self.dt is not None and t < self.dt:
+            # going back in time
+            self.reset()
+        self.dt = t
+        changed = False
+        activations, deactivations = self.activations, self.deactivations
+        while (self.next_activation < len(activations)
+               and self.starts[activations[self.next_activation]] <= t):
+            i = activations[self.next_activation]
+            # contracts that have already ended are never activated
+            if self.ends[i] >= t:
+                self.active.add(i)
+                changed = True
+            self.next_activation += 1
+        while (self.next_deactivation < len(deactivations)
+               and self.ends[deactivations[self.next_deactivation]] < t):
+            i = deactivations[self.next_deactivation]
+            if i in self.active:
+                self.active.remove(i)
+                changed = True
+            self.next_deactivation += 1
+        if changed:
+            self.valid = [self.contracts[i] for i in sorted(self.active)]
+        return self.valid
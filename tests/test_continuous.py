@@ -0,0 +1,82 @@
+"""
+Tests of history read from continuous series materialized at ingestion
+against history assembled by zipline's DataPortal.
+
+Usage (from parent directory of bundles/):
+python -m pytest tests
+"""
+import os
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('zipline')
+
+from zipline.data.data_portal import DataPortal
+from zipline.data.us_equity_pricing import BcolzDailyBarReader, BcolzDailyBarWriter
+from zipline.testing.core import tmp_asset_finder
+from zipline.utils.calendars import get_calendar
+from bundles.continuous import ContinuousDataPortal, write_continuous_series
+from bundles.rolls import collect_volumes, roll_schedule, write_roll_schedule
+from test_rolls import gc_contracts
+
+
+ROLL_STYLES = ['volume', 'calendar']
+
+ADJUSTMENTS = ['mul', 'add']
+
+
+def daily_bars(volumes, sessions):
+    """Generate (sid, daily bars) pairs for all sessions, as the bundle
+    writes them, with prices finer than the tick size.
+    """
+    for sid, volume in volumes.items():
+        volume = volume.reindex(sessions, fill_value=0).values
+        traded = volume > 0
+        close = 1200 + 3.71 * sid + 0.13 * np.arange(len(sessions))
+        yield sid, pd.DataFrame({
+            'open': np.where(traded, close - 0.52, 0),
+            'high': np.where(traded, close + 1.27, 0),
+            'low': np.where(traded, close - 1.33, 0),
+            'close': np.where(traded, close, 0),
+            'volume': volume,
+        }, index=sessions.tz_localize(None))
+
+
+def test_predicated_root_history_matches_zipline(tmpdir):
+    bundle_dir = str(tmpdir)
+    calendar = get_calendar('NYSE')
+    sessions = calendar.sessions_in_range(pd.Timestamp('2015-01-02', tz='UTC'),
+                                          pd.Timestamp('2016-06-30', tz='UTC'))
+    contracts, volumes = gc_contracts(sessions, calendar.all_sessions)
+    root_symbols = pd.DataFrame({'root_symbol': ['GC'], 'root_symbol_id': [0],
+                                 'sector': ['Metals'], 'description': ['Gold'],
+                                 'exchange': ['CMES']})
+
+    bars_file = os.path.join(bundle_dir, 'daily_equities.bcolz')
+    collected = {}
+    BcolzDailyBarWriter(bars_file, calendar, sessions[0], sessions[-1]).write(
+        collect_volumes(daily_bars(volumes, sessions), sessions, collected))
+    reader = BcolzDailyBarReader(bars_file)
+    schedule = roll_schedule(contracts, sessions, calendar.all_sessions, collected)
+    write_roll_schedule(schedule, bundle_dir)
+    write_continuous_series(schedule, contracts, reader, bundle_dir,
+                            ROLL_STYLES, [0], ADJUSTMENTS)
+
+    with tmp_asset_finder(equities=None, futures=contracts,
+                          root_symbols=root_symbols) as asset_finder:
+        portal = DataPortal(asset_finder, calendar, sessions[0],
+                            future_daily_reader=reader)
+        continuous_portal = ContinuousDataPortal(bundle_dir, asset_finder, calendar,
+                                                 sessions[0], future_daily_reader=reader)
+        for roll_style in ROLL_STYLES:
+            for adjustment in ADJUSTMENTS:
+                asset = asset_finder.create_continuous_future('GC', 0, roll_style,
+                                                              adjustment)
+                for end in sessions[60::25]:
+                    for field in ['open', 'high', 'low', 'close', 'volume']:
+                        expected = portal.get_history_window(
+                            [asset], end, 40, '1d', field, 'daily')
+                        result = continuous_portal.get_history_window(
+                            [asset], end, 40, '1d', field, 'daily')
+                        pd.testing.assert_frame_equal(result, expected)
@@ -0,0 +1,116 @@
+"""
+Tests of resuming downloads interrupted within and across runs.
+
+Usage (from parent directory of bundles/):
+python -m pytest tests
+"""
+import os
+import requests
+from bundles.download import stream_download
+
+
+CONTENT = bytes(range(256)) * 40
+
+ETAG = '"v1"'
+
+
+class Response:
+    def __init__(self, status_code, headers, content, fail_after=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.fail_after = fail_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            if self.fail_after is not None and start >= self.fail_after:
+                raise requests.ConnectionError('connection reset')
+            yield self.content[start:start + chunk_size]
+
+
+class Session:
+    """Serves CONTENT with range requests, connection fails after
+    fail_after bytes of the next response.
+    """
+
+    def __init__(self, content=CONTENT, etag=ETAG, fail_after=None):
+        self.content = content
+        self.etag = etag
+        self.fail_after = fail_after
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, stream=False, timeout=None):
+        headers = headers or {}
+        self.requests.append(headers)
+        fail_after, self.fail_after = self.fail_after, None
+        offset = 0
+        if 'Range' in headers and headers.get('If-Range', self.etag) == self.etag:
+            offset = int(headers['Range'][len('bytes='):-1])
+        if offset:
+            return Response(206, {
+                'ETag': self.etag,
+                'Content-Range': 'bytes {}-{}/{}'.format(
+                    offset, len(self.content) - 1, len(self.content))},
+                self.content[offset:], fail_after)
+        return Response(200, {'ETag': self.etag,
+                              'Content-Length': str(len(self.content))},
+                        self.content, fail_after)
+
+
+def test_resumes_across_runs(tmpdir):
+    filename = os.path.join(str(tmpdir), 'data.bin')
+    try:
+        stream_download('http://host/data', filename, retries=1,
+                        session=Session(fail_after=1024), chunk_size=512)
+    except IOError:
+        pass
+    assert os.path.getsize(filename + '.part') == 1024
+
+    session = Session()
+    assert stream_download('http://host/data', filename, retries=1,
+                           session=session, chunk_size=512) == 1
+    assert session.requests == [{'Range': 'bytes=1024-', 'If-Range': ETAG}]
+    with open(filename, 'rb') as f:
+        assert f.read() == CONTENT
+    assert not os.path.exists(filename + '.part')
+    assert not os.path.exists(filename + '.part.json')
+
+
+def test_restarts_changed_file(tmpdir):
+    filename = os.path.join(str(tmpdir), 'data.bin')
+    try:
+        stream_download('http://host/data', filename, retries=1,
+                        session=Session(fail_after=1024), chunk_size=512)
+    except IOError:
+        pass
+
+    changed = CONTENT[::-1]
+    stream_download('http://host/data', filename, retries=1,
+                    session=Session(changed, '"v2"'), chunk_size=512)
+    with open(filename, 'rb') as f:
+        assert f.read() == changed
+
+
+def test_discards_part_of_other_request(tmpdir):
+    filename = os.path.join(str(tmpdir), 'data.bin')
+    try:
+        stream_download('http://host/data', filename, params={'download_type': 'partial'},
+                        retries=1, session=Session(fail_after=1024), chunk_size=512)
+    except IOError:
+        pass
+
+    session = Session()
+    stream_download('http://host/data', filename, params={'download_type': 'complete'},
+                    retries=1, session=session, chunk_size=512)
+    assert session.requests == [{}]
+    with open(filename, 'rb') as f:
+        assert f.read() == CONTENT
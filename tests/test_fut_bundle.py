@@ -0,0 +1,42 @@
+"""
+Tests of parsing Quandl price data into daily bars.
+
+Usage (from parent directory of bundles/):
+python -m pytest tests
+"""
+import os
+from zipfile import ZipFile
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('zipline')
+
+from bundles.fut_bundle import load_data_table, parse_pricing_and_vol
+
+
+# prices without a decimal point, as in Quandl rows of e.g. NK (Nikkei)
+INTEGER_PRICE_ROWS = (
+    'NKH2019,2019-01-02,22000,22100,21900,,,22050,10,20\n'
+    'NKH2019,2019-01-03,22050,22200,22000,,,22150,11,21\n'
+)
+
+
+@pytest.fixture
+def integer_price_file(tmpdir):
+    file = os.path.join(str(tmpdir), 'CME_price_data.zip')
+    with ZipFile(file, 'w') as z:
+        z.writestr('CME_20190104.csv', INTEGER_PRICE_ROWS)
+    return file
+
+
+@pytest.mark.parametrize('compact', [False, True])
+def test_integer_prices_pandas_backend(integer_price_file, compact):
+    data = load_data_table(integer_price_file, chunksize=None, compact=compact,
+                           backend='pandas', use_index=False)
+    sessions = pd.DatetimeIndex(['2019-01-02', '2019-01-03'], tz='UTC')
+    symbol_map = pd.Series(['NKH19'])
+    (_, bars), = parse_pricing_and_vol(data, sessions, symbol_map, compact=compact)
+    np.testing.assert_allclose(bars['close'].values, [22050, 22150], atol=1e-3)
+    np.testing.assert_allclose(bars['open'].values, [22000, 22050], atol=1e-3)
+    np.testing.assert_array_equal(bars['volume'].values, [10, 11])
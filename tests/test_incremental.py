@@ -0,0 +1,51 @@
+"""
+Tests of carrying forward bars of a previous ingestion.
+
+Usage (from parent directory of bundles/):
+python -m pytest tests
+"""
+import types
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('zipline')
+
+from bundles import fut_bundle
+from bundles.incremental import previous_bars
+
+
+SESSIONS = pd.date_range('2019-01-02', periods=5, freq='B', tz='UTC')
+
+
+class Reader:
+    """Daily bar reader of constant bars for SESSIONS.
+    """
+    sessions = SESSIONS
+
+    def load_raw_arrays(self, columns, start, end, sids):
+        count = len(self.sessions[(self.sessions >= start) & (self.sessions <= end)])
+        return [np.ones((count, len(sids))) for _ in columns]
+
+
+def test_previous_bars_beyond_reader_sessions():
+    with pytest.raises(ValueError):
+        list(previous_bars(Reader(), [0, 1], len(SESSIONS) + 1))
+    bars = list(previous_bars(Reader(), [0, None], len(SESSIONS)))
+    assert bars[0].shape == (len(SESSIONS), 5)
+    assert bars[1] is None
+
+
+@pytest.mark.parametrize('end_date, carried', [
+    (SESSIONS[-1], True),
+    (SESSIONS[-1] + pd.Timedelta(days=3), False),
+])
+def test_previous_ingestion_ending_after_reader(monkeypatch, end_date, carried):
+    meta = pd.DataFrame({'sid': [0], 'symbol': ['ESH19'],
+                         'end_date': [end_date.tz_localize(None)]})
+    monkeypatch.setattr(fut_bundle, 'previous_ingestion', lambda *args: 'previous')
+    monkeypatch.setattr(fut_bundle, 'load_previous_metadata', lambda *args: meta)
+    monkeypatch.setattr(fut_bundle, 'load_previous_reader', lambda *args: Reader())
+    sessions = pd.date_range(SESSIONS[0], periods=10, freq='B', tz='UTC')
+    previous = fut_bundle.load_previous_ingestion({}, 'output', sessions)
+    assert (previous is not None) == carried
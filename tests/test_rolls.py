@@ -0,0 +1,103 @@
+"""
+Tests of the roll schedule precomputed at ingestion against zipline's roll finders.
+
+Usage (from parent directory of bundles/):
+python -m pytest tests
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('zipline')
+
+from zipline.assets.roll_finder import CalendarRollFinder, VolumeRollFinder
+from zipline.testing.core import tmp_asset_finder
+from zipline.utils.calendars import get_calendar
+from bundles.rolls import collect_volumes, roll_schedule
+
+
+MONTH_CODES = 'FGHJKMNQUVXZ'
+
+# delivery months of gold in zipline's CHAIN_PREDICATES
+GC_MONTHS = 'GJMQVZ'
+
+
+class VolumeReader:
+    """Session reader of volumes (dict of Series by sid) for VolumeRollFinder.
+    """
+
+    def __init__(self, volumes, sessions):
+        self.volumes = volumes
+        self.last_available_dt = sessions[-1]
+
+    def get_value(self, sid, dt, field):
+        return self.volumes[sid].get(dt, 0)
+
+
+def gc_contracts(sessions, all_sessions):
+    """Return (metadata, volumes) of monthly GC contracts listed by the last
+    of sessions, serial months trading more than delivery months, so that
+    chains differ without predicates. Volumes are Series within sessions.
+    """
+    rows = []
+    volumes = {}
+    delivery = pd.date_range(sessions[0].tz_localize(None), periods=36, freq='MS')
+    for sid, month in enumerate(delivery + pd.DateOffset(months=2)):
+        # auto close 3 sessions before the delivery month, listed 120 sessions before
+        close = all_sessions.searchsorted(month.tz_localize('UTC')) - 3
+        start = close - 120
+        if all_sessions[start] > sessions[-1]:
+            break
+        code = MONTH_CODES[month.month - 1]
+        volume = pd.Series(1000 + 100 * np.arange(121), index=all_sessions[start:close + 1])
+        # volume moves to the next contract ahead of auto close
+        volume[-10:] //= 20
+        if code not in GC_MONTHS:
+            volume *= 2
+        volumes[sid] = volume[(volume.index >= sessions[0]) & (volume.index <= sessions[-1])]
+        start_date, end_date = [all_sessions[i].tz_localize(None) for i in (start, close)]
+        rows.append({
+            'sid': sid,
+            'symbol': 'GC{}{}'.format(code, str(month.year)[-2:]),
+            'root_symbol': 'GC',
+            'asset_name': 'Gold',
+            'start_date': start_date,
+            'end_date': end_date,
+            'first_traded': start_date,
+            'notice_date': end_date,
+            'expiration_date': end_date,
+            'auto_close_date': end_date,
+            'tick_size': 0.1,
+            'multiplier': 100.0,
+            'exchange': 'CMES',
+        })
+    return pd.DataFrame(rows).set_index('sid'), volumes
+
+
+def test_predicated_root_matches_zipline():
+    calendar = get_calendar('NYSE')
+    sessions = calendar.sessions_in_range(pd.Timestamp('2015-01-02', tz='UTC'),
+                                          pd.Timestamp('2016-06-30', tz='UTC'))
+    contracts, volumes = gc_contracts(sessions, calendar.all_sessions)
+    bars = ((sid, pd.DataFrame({'volume': volume.reindex(sessions, fill_value=0).values},
+                               index=sessions.tz_localize(None)))
+            for sid, volume in volumes.items())
+    collected = {}
+    for _ in collect_volumes(bars, sessions, collected):
+        pass
+    schedule = roll_schedule(contracts, sessions, calendar.all_sessions, collected)
+
+    with tmp_asset_finder(equities=None, futures=contracts) as asset_finder:
+        finders = {
+            'volume': VolumeRollFinder(calendar, asset_finder,
+                                       VolumeReader(volumes, sessions)),
+            'calendar': CalendarRollFinder(calendar, asset_finder),
+        }
+        for style, finder in finders.items():
+            rows = schedule[schedule['roll_style'] == style]
+            rolls = finder.get_rolls('GC', sessions[0], sessions[-1], 0)
+            assert list(rows['sid']) == [int(sid) for sid, _ in rolls]
+            assert list(rows['start_date'][1:]) == [
+                date.tz_localize(None) for _, date in rolls[:-1]]
+            assert all(contracts.loc[sid, 'symbol'][-3] in GC_MONTHS
+                       for sid in rows['sid'])
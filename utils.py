@@ -1,35 +1,120 @@
 # This is a set of utils that allows to access data outside of algorithms
+#
+# Bundle and DataPortal are opened on first use (of bundle_data, data, history etc.)
+# and cached for the rest of the process, so importing this module is cheap.
+# data is a plain DataPortal, the roll schedule and continuous series of the bundle
+# are used only when asked for: get_data_portal(roll_schedule=True) or
+# get_data_portal(continuous_series=True).
 
 import os
-from zipline.data import bundles
-from zipline.data.data_portal import DataPortal
-from zipline.utils.calendars import get_calendar
-from zipline.assets._assets import Future
-from zipline.utils.run_algo import load_extensions
-
-# Load extensions.py; this allows you access to custom bundles
-load_extensions(
-    default=True,
-    extensions=[],
-    strict=True,
-    environ=os.environ,
-)
-
-# Set-Up Pricing Data Access
-trading_calendar = get_calendar('NYSE')
+import sys
+import types
+from functools import lru_cache
+
 bundle = 'futures'
-bundle_data = bundles.load(bundle)
-
-data = DataPortal(
-    bundle_data.asset_finder,
-    trading_calendar=trading_calendar,
-    first_trading_day=bundle_data.equity_daily_bar_reader.first_trading_day,
-    equity_minute_reader=None,
-    equity_daily_reader=bundle_data.equity_daily_bar_reader,
-    future_daily_reader=bundle_data.equity_daily_bar_reader,
-    adjustment_reader=bundle_data.adjustment_reader,
-)
-
-future = bundle_data.asset_finder.lookup_future_symbol
-continuous_future = bundle_data.asset_finder.create_continuous_future
-history = data.get_history_window
+
+
+@lru_cache(maxsize=None)
+def get_trading_calendar():
+    from zipline.utils.calendars import get_calendar
+    return get_calendar('NYSE')
+
+
+@lru_cache(maxsize=None)
+def get_bundle_data():
+    from zipline.data import bundles
+    from zipline.utils.run_algo import load_extensions
+
+    # Load extensions.py; this allows you access to custom bundles
+    load_extensions(
+        default=True,
+        extensions=[],
+        strict=True,
+        environ=os.environ,
+    )
+    return bundles.load(bundle)
+
+
+@lru_cache(maxsize=None)
+def get_data_portal(roll_schedule=False, continuous_series=False):
+    """DataPortal of the most recent ingestion of the bundle.
+    roll_schedule: install the roll schedule precomputed at ingestion
+    (see bundles/rolls.py), otherwise rolls are found by zipline
+    continuous_series: create ContinuousDataPortal reading history of continuous
+    futures from series materialized at ingestion (see bundles/continuous.py),
+    which installs the roll schedule too
+    """
+    import pandas as pd
+    from zipline.data import bundles
+    from zipline.data.data_portal import DataPortal
+    from bundles.readers import FutureDailyBarReader
+
+    bundle_data = get_bundle_data()
+    kwargs = dict(
+        trading_calendar=get_trading_calendar(),
+        first_trading_day=bundle_data.equity_daily_bar_reader.first_trading_day,
+        equity_minute_reader=None,
+        equity_daily_reader=bundle_data.equity_daily_bar_reader,
+        future_daily_reader=FutureDailyBarReader.from_reader(
+            bundle_data.equity_daily_bar_reader),
+        adjustment_reader=bundle_data.adjustment_reader,
+    )
+    if not (roll_schedule or continuous_series):
+        return DataPortal(bundle_data.asset_finder, **kwargs)
+
+    bundle_dir = bundles.core.most_recent_data(bundle, pd.Timestamp.utcnow(), os.environ)
+    if continuous_series:
+        from bundles.continuous import ContinuousDataPortal
+        return ContinuousDataPortal(bundle_dir, bundle_data.asset_finder, **kwargs)
+    from bundles.rolls import install_roll_schedule
+    data = DataPortal(bundle_data.asset_finder, **kwargs)
+    install_roll_schedule(data, bundle_dir)
+    return data
+
+
+def future(symbol):
+    return get_bundle_data().asset_finder.lookup_future_symbol(symbol)
+
+
+def continuous_future(root_symbol, offset=0, roll_style='volume', adjustment='mul'):
+    return get_bundle_data().asset_finder.create_continuous_future(
+        root_symbol, offset, roll_style, adjustment)
+
+
+def history(assets, end_dt, bar_count, frequency='1d', field='price',
+            data_frequency='daily', ffill=True):
+    """DataPortal.get_history_window for a list of assets.
+    field can also be a list of fields, then DataFrame with (field, asset)
+    columns is returned.
+    """
+    import pandas as pd
+
+    end_dt = pd.Timestamp(end_dt)
+    if end_dt.tz is None:
+        end_dt = end_dt.tz_localize('UTC')
+    portal = get_data_portal()
+    if isinstance(field, str):
+        return portal.get_history_window(assets, end_dt, bar_count, frequency,
+                                         field, data_frequency, ffill)
+    return pd.concat([portal.get_history_window(assets, end_dt, bar_count, frequency,
+                                                f, data_frequency, ffill)
+                      for f in field], axis=1, keys=field)
+
+
+class _LazyModule(types.ModuleType):
+    """Module attributes opening the bundle on first access."""
+
+    @property
+    def trading_calendar(self):
+        return get_trading_calendar()
+
+    @property
+    def bundle_data(self):
+        return get_bundle_data()
+
+    @property
+    def data(self):
+        return get_data_portal()
+
+
+sys.modules[__name__].__class__ = _LazyModule